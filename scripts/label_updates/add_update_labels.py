@@ -1,7 +1,11 @@
 import os, sys
-from os.path import isfile, isdir, join
+from os.path import isfile, isdir, join, dirname, abspath
 import json
-import requests
+
+# Use the shared http session from src/utils
+SRC_ROOT = join(dirname(dirname(dirname(abspath(__file__)))), 'src')
+sys.path.append(SRC_ROOT)
+from utils.http_session import get_http_session
 
 def msg(s): print (s)
 def dashes(): msg(40*'-')
@@ -107,7 +111,7 @@ class GithubLabelMaker:
             github_label_url = self.get_label_url(label_name)   
             msg('github_label_url: %s' % github_label_url)    
             
-            r = requests.get(github_label_url, auth=self.get_github_auth())
+            r = get_http_session().get(github_label_url, auth=self.get_github_auth())
 
             if r.status_code == 200:
                 label_json = json.loads(r.text)
@@ -120,10 +124,10 @@ class GithubLabelMaker:
         
             data = dict(name=label_name, color=label_color)
             if run_update_color:
-                r = requests.patch(get_label_url, data=json.dumps(data), auth=self.get_github_auth())
+                r = get_http_session().patch(github_label_url, data=json.dumps(data), auth=self.get_github_auth())
             else:
                 #create_label_url = 'https://api.github.com/repos/%s/%s/labels' % (REPO_OWNER_NAME, REPO_NAME )
-                r = requests.post(self.get_create_label_url(), data=json.dumps(data), auth=self.get_github_auth())
+                r = get_http_session().post(self.get_create_label_url(), data=json.dumps(data), auth=self.get_github_auth())
         
         
             if r.status_code == 200:
@@ -2,7 +2,6 @@ from __future__ import print_function
 import os
 import sys
 import json
-import requests
 import time
 import re
 
@@ -15,9 +14,12 @@ from jinja2 import Environment, PackageLoader
 
 from utils.msg_util import *
 from utils.human_size import *
-from github_issues.md_translate import translate_for_github
+from utils.http_session import get_http_session
+from utils.rate_limiter import RateLimiter
+from github_issues.md_translate import translate_for_github, rewrite_issue_mentions
 from github_issues.milestone_helper import MilestoneHelper
 from github_issues.label_helper import LabelHelper
+from redmine_ticket.issue_repository import get_issue_repository
 import csv
 
 from settings.base import get_github_auth, REDMINE_SERVER
@@ -31,13 +33,27 @@ class GithubIssueMaker:
     """
     ISSUE_STATE_CLOSED = ['Rejected', 'Closed', 'Resolved']
 
-    def __init__(self, user_map_helper=None, label_mapping_filename=None, milestone_mapping_filename=None):
+    # Times a call is retried after being rejected by a rate limit
+    MAX_RATE_LIMIT_RETRIES = 5
+
+    # Start of the related tickets section (see templates/related_issues.md)
+    RELATED_SECTION_MARKER = '<!-- redmine2github: related issues -->'
+
+    # Section added before the marker was used
+    LEGACY_RELATED_SECTION_PATTERN = re.compile(r'^---\s*^(Related issue\(s\)|Redmine related issue\(s\)|Child issue\(s\)|Redmine child issue\(s\)):.*\Z', re.M | re.S)
+
+    def __init__(self, user_map_helper=None, label_mapping_filename=None, milestone_mapping_filename=None, provision_labels=True):
+        """
+        :param provision_labels: boolean.  If True, the labels in the label map are made on github.
+                    False when the issues are only rendered, e.g. for a migration archive
+        """
         self.github_conn = None
         self.comments_service = None
         self.milestone_manager = MilestoneHelper(milestone_mapping_filename)
-        self.label_helper = LabelHelper(label_mapping_filename)
+        self.label_helper = LabelHelper(label_mapping_filename, provision_labels=provision_labels)
         self.jinja_env = Environment(loader=PackageLoader('github_issues', 'templates'), trim_blocks=True, lstrip_blocks=True)
         self.user_map_helper = user_map_helper
+        self.rate_limiter = RateLimiter()
 
     def get_comments_service(self):
         if self.comments_service is None:
@@ -109,7 +125,22 @@ class GithubIssueMaker:
         return github_username
 
 
-    def update_github_issue_with_related(self, redmine_json_fname, redmine2github_issue_map, include_redmine_links, fix_issue_mentions):
+    def get_redmine_issue(self, redmine_json_fname):
+        """
+        :returns: the redmine issue as a python dict--parsed once and shared by the
+                migration steps (see RedmineIssueRepository).  None if the file doesn't exist
+        """
+        repository = get_issue_repository(os.path.dirname(redmine_json_fname))
+        return repository.get_issue_by_fname(os.path.basename(redmine_json_fname))
+
+    def get_redmine_issue_derived(self, redmine_json_fname, field_name, make_value):
+        """
+        Value made from the redmine issue, e.g. its labels, kept with the parsed issue
+        """
+        repository = get_issue_repository(os.path.dirname(redmine_json_fname))
+        return repository.get_derived(os.path.basename(redmine_json_fname), field_name, make_value)
+
+    def update_github_issue_with_related(self, redmine_json_fname, redmine2github_issue_map, include_redmine_links, fix_issue_mentions, related_info=None, on_mentions_rewritten=None):
         """
         Update a GitHub issue with related tickets as specfied in Redmine
 
@@ -135,15 +166,18 @@ class GithubIssueMaker:
               }
           ],
           "id": 4160,
+
+        :param related_info: optional dict from get_related_issue_info().  Made from the JSON file if not given
+        :param on_mentions_rewritten: optional function(redmine issue #), called once the issue mentions are rewritten.
+                    Mentions must only be rewritten once: the github numbers would be changed again
+        :returns: True if the github issue was updated with related tickets
         """
-        if not os.path.isfile(redmine_json_fname):
+        rd = self.get_redmine_issue(redmine_json_fname)       # The redmine issue as a python dict
+        if rd is None:
             msgx('ERROR.  update_github_issue_with_related. file not found: %s' % redmine_json_fname)
 
         #msg('issue map: %s' % redmine2github_issue_map)
 
-        json_str = open(redmine_json_fname, 'rU').read()
-        rd = json.loads(json_str)       # The redmine issue as a python dict
-
         redmine_issue_num = rd.get('id', None)
         if redmine_issue_num is None:
             return
@@ -153,24 +187,90 @@ class GithubIssueMaker:
             msg('Redmine issue not in map')
             return
 
+        if related_info is None:
+            related_info = self.get_related_issue_info(rd, redmine2github_issue_map)
+
+        # update description with github ticket numbers
+        # update comments with github ticket numbers
+        # remove from relations/children list if already mentioned in comments
+
+        try:
+            issue = self.get_github_conn().issues.get(number=github_issue_num)
+        except pygithub3.exceptions.NotFound:
+            msg('Issue not found!')
+            return
+
+        # a related tickets section from an earlier run is replaced.  (Its github numbers aren't rewritten)
+        body = self.strip_related_issues(issue.body)
+        if fix_issue_mentions:
+
+            # replace issue mentions in the issue description
+            # mentions of redmine issues not in the map are left as they are
+            new_body = rewrite_issue_mentions(body, redmine2github_issue_map)
+            if new_body != body:
+                self.get_github_conn().issues.update(number=github_issue_num, data={'body':new_body})
+                body = new_body
+
+            # iterate through the comments and replace issue mentions
+            comments = self.get_github_conn().issues.comments.list(number=github_issue_num)
+            for page in comments:
+                for c in page:
+                    new_body = rewrite_issue_mentions(c.body, redmine2github_issue_map)
+                    if new_body != c.body:
+                        self.get_github_conn().issues.comments.update(message=new_body, id=c.id)
+
+            if on_mentions_rewritten is not None:
+                on_mentions_rewritten(redmine_issue_num)
+
+        #
+        # Update github issue with related and child tickets
+        #
+        #
+        updated_description = self.render_related_issues(body, related_info, include_redmine_links)
+        if updated_description is None:
+            return
+
+        issue = self.get_github_conn().issues.update(number=github_issue_num, data={'body':updated_description})
+
+        msg('Issue updated!')#' % issue.body)
+        return True
+
+
+    def get_related_issue_info(self, rd, redmine2github_issue_map, related_ids=None, child_ids=None):
+        """
+        For a redmine issue, list the related and child tickets--both the redmine
+        numbers and, where they are in the map, the github numbers
+
+        :param rd: dict, the redmine issue
+        :param redmine2github_issue_map: { redmine issue # (str) : github issue # }
+        :param related_ids: optional list of related redmine #'s, e.g. from a RelationIndex.  Read from rd if not given
+        :param child_ids: optional list of child redmine #'s.  Read from rd if not given
+        :returns: dict with sorted lists: github_related_tickets, original_related_tickets,
+                    github_child_tickets, original_child_tickets, and unresolved_tickets (redmine #'s not in the map)
+        """
+        unresolved_tickets = []
+
         # Related tickets under 'relations'
         #
-        github_related_tickets = []
-        original_related_tickets = []
-        related_ticket_info = rd.get('relations', [])
-        if related_ticket_info:
-            for rel in related_ticket_info:
+        if related_ids is None:
+            related_ids = []
+            for rel in rd.get('relations', None) or []:
                 issue_to_id = rel.get('issue_to_id', None)
                 if issue_to_id is None:
                     continue
                 if rd.get('id') == issue_to_id:  # skip relations pointing to this ticket
                     continue
+                related_ids.append(issue_to_id)
 
-                original_related_tickets.append(issue_to_id)
-                related_github_issue_num = redmine2github_issue_map.get(str(issue_to_id), None)
-                msg(related_github_issue_num)
-                if related_github_issue_num:
-                    github_related_tickets.append(related_github_issue_num)
+        github_related_tickets = []
+        original_related_tickets = []
+        for issue_to_id in related_ids:
+            original_related_tickets.append(issue_to_id)
+            related_github_issue_num = redmine2github_issue_map.get(str(issue_to_id), None)
+            if related_github_issue_num:
+                github_related_tickets.append(related_github_issue_num)
+            else:
+                unresolved_tickets.append(issue_to_id)
         github_related_tickets.sort()
         original_related_tickets.sort()
         #
@@ -180,73 +280,70 @@ class GithubIssueMaker:
         #
         # "children": [{ "tracker": {"id": 2, "name": "Feature"    }, "id": 3454, "subject": "Icons in results and facet"    }, ...]
         #
+        if child_ids is None:
+            child_ids = [ctick.get('id') for ctick in rd.get('children', None) or [] if ctick.get('id', None) is not None]
+
         github_child_tickets = []
         original_child_tickets = []
-        child_ticket_info = rd.get('children', [])
-        if child_ticket_info:
-            for ctick in rd.get('children', []):
-                child_id = ctick.get('id', None)
-                if child_id is None:
-                    continue
-
-                original_child_tickets.append(child_id)
-                child_github_issue_num = redmine2github_issue_map.get(str(child_id), None)
-
-                msg(child_github_issue_num)
-                if child_github_issue_num:
-                    github_child_tickets.append(child_github_issue_num)
+        for child_id in child_ids:
+            original_child_tickets.append(child_id)
+            child_github_issue_num = redmine2github_issue_map.get(str(child_id), None)
+
+            if child_github_issue_num:
+                github_child_tickets.append(child_github_issue_num)
+            else:
+                unresolved_tickets.append(child_id)
         original_child_tickets.sort()
         github_child_tickets.sort()
         #
         # end: Related tickets under 'children'
 
-        # update description with github ticket numbers
-        # update comments with github ticket numbers
-        # remove from relations/children list if already mentioned in comments
+        return dict(github_related_tickets=github_related_tickets\
+                    , original_related_tickets=original_related_tickets\
+                    , github_child_tickets=github_child_tickets\
+                    , original_child_tickets=original_child_tickets\
+                    , unresolved_tickets=sorted(unresolved_tickets)\
+                    )
 
-        try:
-            issue = self.get_github_conn().issues.get(number=github_issue_num)
-        except pygithub3.exceptions.NotFound:
-            msg('Issue not found!')
-            return
 
-        if fix_issue_mentions:
+    def strip_related_issues(self, description):
+        """
+        :returns: the description without the related tickets section added by an earlier run
+        """
+        if not description:
+            return description
 
-            # replace issue mentions in the issue description
-            # the lambda looks a little weird, but basically it is replacing the redmine issue with the github
-            # issue. if the redmine issue key isn't present in the map it which will replace the redmine issue
-            # with itself (e.g. not change it)
-            new_body = re.sub(r'#(\d+)', lambda m: '#{}'.format(redmine2github_issue_map.get(m.group(1), m.group(1))), issue.body)
-            if new_body != issue.body:
-                self.get_github_conn().issues.update(number=github_issue_num, data={'body':new_body})
+        idx = description.find(self.RELATED_SECTION_MARKER)
+        if idx > -1:
+            return description[:idx].rstrip()
 
-            # iterate through the comments and replace issue mentions
-            comments = self.get_github_conn().issues.comments.list(number=github_issue_num)
-            issue_pattern = re.compile(r'#(\d+)')
-            for page in comments:
-                for c in page:
-                    # same lambda as above
-                    new_body = re.sub(r'#(\d+)', lambda m: '#{}'.format(redmine2github_issue_map.get(m.group(1), m.group(1))), c.body)
-                    if new_body != c.body:
-                        self.get_github_conn().issues.comments.update(message=new_body, id=c.id)
+        m = self.LEGACY_RELATED_SECTION_PATTERN.search(description)
+        if m:
+            return description[:m.start()].rstrip()
+        return description
 
+    def render_related_issues(self, original_description, related_info, include_redmine_links):
+        """
+        Add the related and child tickets to the bottom of a description
 
-        #
-        # Update github issue with related and child tickets
-        #
-        #
+        :param original_description: str, the github issue description
+        :param related_info: dict from get_related_issue_info()
+        :returns: str, the updated description.  None if there are no github related or child tickets
+        """
+        github_related_tickets = related_info['github_related_tickets']
+        github_child_tickets = related_info['github_child_tickets']
         if not github_child_tickets and not github_related_tickets:
-            return
+            return None
 
         # Format related and children ticket numbers
         original_issues_str = ""
         original_children_str = ""
         if include_redmine_links:
-            original_issues_formatted = [ """[%s](%s)""" % (x, self.format_redmine_issue_link(x)) for x in original_related_tickets]
+            original_issues_formatted = [ """[%s](%s)""" % (x, self.format_redmine_issue_link(x)) for x in related_info['original_related_tickets']]
             original_issues_str = ', '.join(original_issues_formatted)
             msg('Redmine related issues: %s' % original_issues_str)
 
-            original_children_formatted = [ """[%s](%s)""" % (x, self.format_redmine_issue_link(x)) for x in original_child_tickets]
+            original_children_formatted = [ """[%s](%s)""" % (x, self.format_redmine_issue_link(x)) for x in related_info['original_child_tickets']]
             original_children_str = ', '.join(original_children_formatted)
             msg('Redmine sub-issues: %s' % original_children_str)
 
@@ -254,13 +351,13 @@ class GithubIssueMaker:
         related_issue_str = ', '.join(related_issues_formatted)
         msg('Github related issues: %s' % related_issue_str)
 
-        github_children_formatted = [ '#%d' % x for x in github_child_tickets]
+        github_children_formatted = [ '#%d' % int(x) for x in github_child_tickets]
         github_children_str = ', '.join(github_children_formatted)
         msg('Github sub-issues: %s' % github_children_str)
 
         template = self.jinja_env.get_template('related_issues.md')
 
-        template_params = { 'original_description' : issue.body\
+        template_params = { 'original_description' : original_description\
                             , 'original_issues' : original_issues_str\
                             , 'related_issues' : related_issue_str\
                             , 'child_issues_original' : original_children_str\
@@ -268,11 +365,7 @@ class GithubIssueMaker:
 
                             }
 
-        updated_description = template.render(template_params)
-
-        issue = self.get_github_conn().issues.update(number=github_issue_num, data={'body':updated_description})
-
-        msg('Issue updated!')#' % issue.body)
+        return template.render(template_params)
 
 
     def format_redmine_issue_link(self, issue_id):
@@ -332,16 +425,37 @@ class GithubIssueMaker:
         - Format the GitHub description to include original redmine info: author, link back to redmine ticket, etc
         - Add/Create Labels
         - Add/Create Milestones
+
+        See build_issue_data() for the kwargs
         """
-        if not os.path.isfile(redmine_json_fname):
+        issue_data, unresolved_tickets = self.build_issue_data(redmine_json_fname, **kwargs)
+
+        return self.import_issue(issue_data)
+
+    def build_issue_data(self, redmine_json_fname, **kwargs):
+        """
+        Make the github import api payload for a Redmine issue
+
+        :param include_comments: optional, boolean.  Default True
+        :param include_assignee: optional, boolean.  Default True
+        :param include_redmine_links: optional, boolean.  Default True
+        :param redmine2github_issue_map: optional, { redmine issue # (str) : github issue # }.  If the github numbers
+                are known before the import, the related and child tickets are added to the description right away
+                and issue mentions (e.g. "see #1234") in the description and comments are changed to the github numbers
+        :param relation_index: optional RelationIndex.  The related and child tickets are read from it--with
+                both sides of each relation, as in the migrate_related_tickets() pass
+        :returns: (issue_data dict, list of related/child redmine #'s not found in redmine2github_issue_map).
+                If the list is empty and a redmine2github_issue_map was given, the related tickets are in the description
+        """
+        rd = self.get_redmine_issue(redmine_json_fname)       # The redmine issue as a python dict
+        if rd is None:
             msgx('ERROR.  make_github_issue. file not found: %s' % redmine_json_fname)
 
         include_comments = kwargs.get('include_comments', True)
         include_assignee = kwargs.get('include_assignee', True)
         include_redmine_links = kwargs.get('include_redmine_links', True)
-
-        json_str = open(redmine_json_fname, 'rU').read()
-        rd = json.loads(json_str)       # The redmine issue as a python dict
+        redmine2github_issue_map = kwargs.get('redmine2github_issue_map', None)
+        relation_index = kwargs.get('relation_index', None)
 
         #msg(json.dumps(rd, indent=4))
         msg('Attempt to create issue: [#%s][%s]' % (rd.get('id'), rd.get('subject') ))
@@ -349,32 +463,16 @@ class GithubIssueMaker:
         # (1) Format the github issue description
         #
         #
-        template = self.jinja_env.get_template('description.md')
-
-        author_name = rd.get('author', {}).get('name', None)
-        author_github_username = self.format_name_for_github(author_name)
-        redmine_link = ""
-        if include_redmine_links:
-            redmine_link = self.format_redmine_issue_link(rd.get('id'))
-
-        desc_dict = {'description' : translate_for_github(rd.get('description', 'no description'))\
-                    , 'redmine_link' : redmine_link
-                    , 'redmine_issue_num' : rd.get('id')\
-                    , 'start_date' : rd.get('start_date', None)\
-                    , 'author_name' : author_name\
-                    , 'author_github_username' : author_github_username\
-                    , 'redmine_assignee' : self.get_redmine_assignee_name(rd)
-        }
-
-        description_info = template.render(desc_dict)
+        description_info, unresolved_tickets = self.render_issue_description(rd, include_redmine_links, redmine2github_issue_map, relation_index)
 
         #
         # (2) Create the dictionary for the GitHub issue--for the github API
         #
         #self.label_helper.clear_labels(151)
+        label_names = self.get_redmine_issue_derived(redmine_json_fname, 'labels', self.label_helper.get_label_names_from_issue)
         github_issue_dict = { 'title': rd.get('subject')\
                     , 'body' : description_info\
-                    , 'labels' : self.label_helper.get_label_names_from_issue(rd)
+                    , 'labels' : label_names
                     }
 
         milestone_number = self.milestone_manager.get_create_milestone(rd)
@@ -382,7 +480,7 @@ class GithubIssueMaker:
             github_issue_dict['milestone'] = milestone_number
 
         if include_assignee:
-            assignee = self.get_assignee(rd)
+            assignee = self.get_redmine_issue_derived(redmine_json_fname, 'assignee', self.get_assignee)
             if assignee:
                 github_issue_dict['assignee'] = assignee
         else:
@@ -395,7 +493,7 @@ class GithubIssueMaker:
         #
         comments_data = []
         if include_comments:
-            comments_data = self.add_comments_for_issue(rd)
+            comments_data = self.add_comments_for_issue(rd, redmine2github_issue_map)
 
         issue_data = {
           'issue' : {
@@ -404,13 +502,61 @@ class GithubIssueMaker:
             'created_at' : rd.get('created_on', None),
             'assignee' : assignee,
             'milestone' : milestone_number,
-            'closed' : self.is_redmine_issue_closed(rd),
-            'labels' : self.label_helper.get_label_names_from_issue(rd),
+            'closed' : self.get_redmine_issue_derived(redmine_json_fname, 'closed', self.is_redmine_issue_closed),
+            'labels' : label_names,
           },
           'comments' : comments_data,
         }
 
-        return self.import_issue(issue_data)
+        return (issue_data, unresolved_tickets)
+
+    def render_issue_description(self, rd, include_redmine_links=True, redmine2github_issue_map=None, relation_index=None):
+        """
+        Render the github issue description from the description.md template
+
+        :param rd: dict, the redmine issue
+        :param redmine2github_issue_map: optional, see build_issue_data()
+        :param relation_index: optional RelationIndex, see build_issue_data()
+        :returns: (description str, list of related/child redmine #'s not found in redmine2github_issue_map)
+        """
+        template = self.jinja_env.get_template('description.md')
+
+        author_name = rd.get('author', {}).get('name', None)
+        author_github_username = self.format_name_for_github(author_name)
+        redmine_link = ""
+        if include_redmine_links:
+            redmine_link = self.format_redmine_issue_link(rd.get('id'))
+
+        description = translate_for_github(rd.get('description', 'no description'))
+        description = rewrite_issue_mentions(description, redmine2github_issue_map)
+
+        desc_dict = {'description' : description\
+                    , 'redmine_link' : redmine_link
+                    , 'redmine_issue_num' : rd.get('id')\
+                    , 'start_date' : rd.get('start_date', None)\
+                    , 'author_name' : author_name\
+                    , 'author_github_username' : author_github_username\
+                    , 'redmine_assignee' : self.get_redmine_assignee_name(rd)
+        }
+
+        description_info = template.render(desc_dict)
+
+        # Only add the related tickets if all of them can be added.  Otherwise it's left to
+        # the update_github_issue_with_related() pass after the import
+        unresolved_tickets = []
+        if redmine2github_issue_map is not None:
+            related_ids, child_ids = None, None
+            if relation_index is not None:
+                related_ids = relation_index.get_related_ids(rd.get('id'))
+                child_ids = relation_index.get_child_ids(rd.get('id'))
+            related_info = self.get_related_issue_info(rd, redmine2github_issue_map, related_ids, child_ids)
+            unresolved_tickets = related_info['unresolved_tickets']
+            if not unresolved_tickets:
+                description_with_related = self.render_related_issues(description_info, related_info, include_redmine_links)
+                if description_with_related is not None:
+                    description_info = description_with_related
+
+        return (description_info, unresolved_tickets)
 
     def import_issue(self, issue_data):
         """ use the github issue import api to import an issue in one api call (with correct dates)
@@ -426,18 +572,42 @@ class GithubIssueMaker:
 
         auth = (get_github_auth()['login'], get_github_auth()['password'])
 
-        r = requests.post(url, data = json.dumps(issue_data), auth = auth, headers = headers)
+        r = self.rate_limited_request('post', url, data = json.dumps(issue_data), auth = auth, headers = headers)
 
         github_response = r.json()
-        reset_epoch = r.headers['X-RateLimit-Reset']
+        reset_epoch = r.headers.get('X-RateLimit-Reset', None)
 
         return [ r.status_code, github_response, reset_epoch ]
 
-    def get_github_ids(self, start_time):
-        """ get a map of temporary github import ids to the final issue id on github """
+    def rate_limited_request(self, method, url, **kwargs):
+        """
+        Make a github api call through the rate limiter.  If the call is rejected
+        by a rate limit, wait as the limiter says and try again.
 
-        # now check on the status, so that we can get the resulting github issue id
-        url = 'https://api.github.com/repos/{}/{}/import/issues?since={}'.format(get_github_auth()['user'], get_github_auth()['repo'], str(start_time))
+        :param method: str, e.g. 'get', 'post'
+        :returns: requests response
+        """
+        for attempt in range(0, self.MAX_RATE_LIMIT_RETRIES):
+            self.rate_limiter.acquire()
+            r = getattr(get_http_session(), method)(url, **kwargs)
+            if not self.rate_limiter.update_from_response(r):
+                return r
+        return r
+
+    def get_github_ids(self, start_time, import_ids=None, on_resolved=None, on_failed=None):
+        """ get a map of temporary github import ids to the final issue id on github
+
+        (1) Walk every page of the imports made since the start time
+        (2) Poll the imports still pending--one at a time, with a backoff--until they resolve
+
+        :param start_time: str, e.g. "2014-07-09T14:22:31Z"
+        :param import_ids: optional, list of import ids to wait for.  Default: the imports pending in step (1)
+        :param on_resolved: optional function(import_id, github issue number), called as each import resolves
+        :param on_failed: optional function(import_id, github response), called for each failed import.
+                    Without it, a failed import stops the program
+        :returns: { import id : github issue number (str) }
+        """
+        base_url = 'https://api.github.com/repos/{}/{}/import/issues'.format(get_github_auth()['user'], get_github_auth()['repo'])
 
         headers = {
             'Accept' : 'application/vnd.github.golden-comet-preview+json'
@@ -446,32 +616,140 @@ class GithubIssueMaker:
         auth = (get_github_auth()['login'], get_github_auth()['password'])
 
         github_id_map = dict()
+        pending_ids = set()
+        failed_imports = {}     # { import id : github response }
+
+        def check_import_response(issue_response):
+            if 'issue_url' in issue_response:
+                import_id = issue_response['id']
+                pending_ids.discard(import_id)
+                if import_id in github_id_map:
+                    return
+                issue_url = issue_response['issue_url']
+                github_id_map[import_id] = issue_url.rsplit('/', 1)[-1]
+                if on_resolved is not None:
+                    on_resolved(import_id, github_id_map[import_id])
+            elif issue_response['status'] == 'pending':
+                pending_ids.add(issue_response['id'])
+            else:
+                pending_ids.discard(issue_response['id'])
+                failed_imports[issue_response['id']] = issue_response
+
+        # (1) every page of imports since the start time
+        #
+        url = '{}?since={}&per_page=100'.format(base_url, str(start_time))
+        while url:
+            r = self.rate_limited_request('get', url, auth = auth, headers = headers)
+            if r.status_code != 200 and r.status_code != 202:
+                msgx('Error checking status of issue. github http response status %s. json received: %s' % (r.status_code, r.json()))
+            for issue_response in r.json():
+                check_import_response(issue_response)
+            url = r.links.get('next', {}).get('url', None)
 
-        pending_count = 1
-        while pending_count > 0:
+        if import_ids is not None:
+            pending_ids = set([x for x in import_ids if not x in github_id_map and not x in failed_imports])
 
-            pending_count = 0
+        # (2) poll only the pending imports
+        #
+        wait_seconds = 1
+        while pending_ids:
+            msgt("%d issue imports are still pending, sleeping %s seconds then retrying id check" % (len(pending_ids), wait_seconds))
+            time.sleep(wait_seconds)
+
+            pending_before = len(pending_ids)
+            for import_id in sorted(pending_ids):
+                check_import_response(self.get_import_status(import_id))
+                if import_id in pending_ids:
+                    break   # imports are processed in order, the later ones will be pending too
+
+            # back off while nothing resolves
+            if len(pending_ids) < pending_before:
+                wait_seconds = 1
+            else:
+                wait_seconds = min(wait_seconds * 2, 30)
+
+        if failed_imports:
+            if on_failed is None:
+                msgx("Couldn't find issue URL in github response: %s" % list(failed_imports.values()))
+            for import_id in sorted(failed_imports.keys()):
+                on_failed(import_id, failed_imports[import_id])
 
-            r = requests.get(url, auth = auth, headers = headers)
+        return github_id_map
 
-            if r.status_code != 200 and r.status_code != 202:
-                msgx('Error checking status of issue. github http response status %s. json received: %s' % (r.status_code, r.json()))
-            github_response = r.json()
-
-            for issue_response in github_response:
-                if 'issue_url' not in issue_response:
-                    if issue_response['status'] == 'pending':
-                        pending_count += 1
-                    else:
-                        msgx("Couldn't find issue URL in github response: %s" % issue_response)
-                else:
-                    issue_url = issue_response['issue_url']
-                    github_id_map[issue_response['id']] = issue_url.rsplit('/', 1)[-1]
-            if pending_count > 0:
-                msgt("%d issue imports are still pending, sleeping then retrying id check" % pending_count)
-                time.sleep(5) # wait for a second to see if pending issues resolve
+    def get_import_status(self, import_id):
+        """ check on a single issue import
 
-        return github_id_map
+        :returns: dict from the github api.  e.g. { "id" : 12345, "status" : "imported", "issue_url" : ".../issues/7", ...}
+        """
+        url = 'https://api.github.com/repos/{}/{}/import/issues/{}'.format(get_github_auth()['user'], get_github_auth()['repo'], import_id)
+
+        headers = {
+            'Accept' : 'application/vnd.github.golden-comet-preview+json'
+        }
+
+        auth = (get_github_auth()['login'], get_github_auth()['password'])
+
+        r = self.rate_limited_request('get', url, auth = auth, headers = headers)
+        if r.status_code != 200:
+            msgx('Error checking status of issue. github http response status %s. json received: %s' % (r.status_code, r.json()))
+        return r.json()
+
+    def get_highest_issue_number(self):
+        """ get the number of the most recently created issue (or pull request) in the repository.  0 if there are none
+
+        Note: issues brought in with the import api keep their redmine creation dates,
+        so this is not always the highest issue number.  See MigrationManager.get_predicted_github_numbers()
+        """
+        url = 'https://api.github.com/repos/{}/{}/issues?state=all&sort=created&direction=desc&per_page=1'.format(get_github_auth()['user'], get_github_auth()['repo'])
+
+        auth = (get_github_auth()['login'], get_github_auth()['password'])
+
+        r = self.rate_limited_request('get', url, auth = auth)
+        if r.status_code != 200:
+            msgx('Error retrieving the latest issue. github http response status %s. json received: %s' % (r.status_code, r.json()))
+
+        issues = r.json()
+        if not issues:
+            return 0
+        return int(issues[0]['number'])
+
+    def spot_check_github_ids(self, predicted_id_map, sample_size=5):
+        """ check that imports got the github issue numbers predicted for them
+
+        Imports are processed in order, so once the last import in the sample resolves,
+        the earlier ones have too.
+
+        :param predicted_id_map: { import id : predicted github issue number }
+        :param sample_size: int, number of imports to check (the first and last are always checked)
+        :returns: True if every sampled import got its predicted number
+        """
+        import_ids = sorted(predicted_id_map.keys())
+        if not import_ids:
+            return True
+
+        step = max(len(import_ids) // max(sample_size - 1, 1), 1)
+        sample_ids = sorted(set(import_ids[::step] + [import_ids[-1]]))
+
+        wait_seconds = 1
+        for import_id in sample_ids:
+            while True:
+                issue_response = self.get_import_status(import_id)
+                if 'issue_url' in issue_response:
+                    break
+                if issue_response['status'] != 'pending':
+                    msg('Spot check: import %s failed: %s' % (import_id, issue_response))
+                    return False
+                msg('Spot check: import %s is pending, sleeping %s seconds' % (import_id, wait_seconds))
+                time.sleep(wait_seconds)
+                wait_seconds = min(wait_seconds * 2, 30)
+
+            github_issue_num = int(issue_response['issue_url'].rsplit('/', 1)[-1])
+            if github_issue_num != int(predicted_id_map[import_id]):
+                msg('Spot check: import %s is github issue %s, predicted %s' % (import_id, github_issue_num, predicted_id_map[import_id]))
+                return False
+
+        msg('Spot check: %s of %s imports match the predicted github issue numbers' % (len(sample_ids), len(import_ids)))
+        return True
 
     def is_redmine_issue_closed(self, redmine_issue_dict):
         """
@@ -493,7 +771,10 @@ class GithubIssueMaker:
         return False
 
 
-    def add_comments_for_issue(self, rd):
+    def add_comments_for_issue(self, rd, redmine2github_issue_map=None):
+        """
+        :param redmine2github_issue_map: optional, { redmine issue # (str) : github issue # }, to change issue mentions in the notes
+        """
 
         journals = rd.get('journals', None)
         comment_template = self.jinja_env.get_template('comment.md')
@@ -506,7 +787,7 @@ class GithubIssueMaker:
             author_github_username = self.format_name_for_github(author_name)
 
             note_dict = {
-                'description' : translate_for_github(j.get('notes', None)),
+                'description' : rewrite_issue_mentions(translate_for_github(j.get('notes', None)), redmine2github_issue_map),
                 'author_name' : author_name,
                 'author_github_username' : author_github_username,
             }
@@ -542,7 +823,7 @@ class GithubIssueMaker:
             author_github_username = self.format_name_for_github(author_name)
 
             attachment_dict = {
-                'description' : translate_for_github(a.get('description', None)),
+                'description' : rewrite_issue_mentions(translate_for_github(a.get('description', None)), redmine2github_issue_map),
                 'file_name' : a.get('filename', None),
                 'file_size' : humansize(a.get('filesize', None)),
                 'file_url' : a.get('content_url', None),
@@ -561,6 +842,14 @@ class GithubIssueMaker:
 
         return comments_data
 
+    def get_comment_author_names(self, rd):
+        """
+        :returns: list of redmine user names, one for each comment made by add_comments_for_issue()--in the same order
+        """
+        author_names = [j.get('user', {}).get('name', None) for j in rd.get('journals', None)]
+        author_names += [a.get('author', {}).get('name', None) for a in rd.get('attachments', None)]
+        return author_names
+
 if __name__=='__main__':
     #auth = dict(login=GITHUB_LOGIN, password=GITHUB_PASSWORD_OR_PERSONAL_ACCESS_TOKEN, repo=GITHUB_TARGET_REPOSITORY, user=GITHUB_TARGET_USERNAME)
     #milestone_service = pygithub3.services.issues.Milestones(**auth)
@@ -0,0 +1,93 @@
+from __future__ import print_function
+import os
+import json
+import time
+import threading
+
+from utils.msg_util import *
+
+
+class ImportLog:
+    """
+    Append-only, fsync'd log of the GitHub issue imports--written as each import is accepted,
+    so a crash doesn't lose the redmine -> github mapping.  (GitHub issues can't be deleted,
+    so re-importing after a crash would make duplicates.)
+
+    One JSON line per event:
+
+        {"redmine_issue_num": 4050, "import_id": 12345, "status": "pending", "github_issue_num": null, "dummy": false, "links_embedded": false, "mentions_rewritten": false, "logged_at": 1404915751.2}
+
+    "links_embedded" is true when the related/child tickets were added to the description at import time.
+    "mentions_rewritten" is true when issue mentions were changed to the github numbers at import time.
+    An import that github reports as failed is logged with status "failed": a rerun imports the issue again.
+
+    For each redmine issue, the last line wins.
+    """
+
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, log_fname):
+        self.log_fname = log_fname
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_log_fname(redmine2github_map_file):
+        """
+        e.g. "redmine2github_issue_map.json" -> "redmine2github_issue_map.import_log.jsonl"
+        """
+        return os.path.splitext(redmine2github_map_file)[0] + '.import_log.jsonl'
+
+    def append(self, redmine_issue_num, import_id, status, github_issue_num=None, dummy=False, links_embedded=False, mentions_rewritten=False):
+        entry = dict(redmine_issue_num=int(redmine_issue_num)\
+                    , import_id=import_id\
+                    , status=status\
+                    , github_issue_num=github_issue_num\
+                    , dummy=dummy\
+                    , links_embedded=links_embedded\
+                    , mentions_rewritten=mentions_rewritten\
+                    , logged_at=time.time()\
+                    )
+        line = json.dumps(entry) + '\n'
+        with self.lock:
+            fh = open(self.log_fname, 'a')
+            fh.write(line)
+            fh.flush()
+            os.fsync(fh.fileno())
+            fh.close()
+
+    def load(self):
+        """
+        :returns: { redmine issue num (int) : last log entry }
+        """
+        entries = {}
+        if not os.path.isfile(self.log_fname):
+            return entries
+
+        for line in open(self.log_fname, 'rU'):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue    # partially written line
+            entries[entry['redmine_issue_num']] = entry
+        return entries
+
+    def get_imported_entries(self):
+        """
+        :returns: { redmine issue num : entry } for imports that were accepted by github (not failed)
+        """
+        return dict([(k, v) for k, v in self.load().items() if v.get('status') != self.STATUS_FAILED])
+
+    def get_redmine2github_map(self):
+        """
+        :returns: { redmine issue num (str) : github issue num } for the resolved imports
+        """
+        return dict([(str(k), v['github_issue_num']) for k, v in self.load().items() if v.get('github_issue_num')])
+
+    def get_unresolved_entries(self):
+        """
+        :returns: { redmine issue num : entry } for accepted imports without a github issue number yet
+        """
+        return dict([(k, v) for k, v in self.get_imported_entries().items() if not v.get('github_issue_num')])
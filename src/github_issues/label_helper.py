@@ -5,20 +5,39 @@ if __name__=='__main__':
     SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     sys.path.append(SRC_ROOT)
 
-import requests
+import time
+import threading
+from collections import OrderedDict
+
 from utils.msg_util import *
+from utils.http_session import get_http_session
+from utils.worker_pool import WorkerPool
 from settings.base import GITHUB_LOGIN, GITHUB_PASSWORD_OR_PERSONAL_ACCESS_TOKEN, GITHUB_TARGET_USERNAME, GITHUB_TARGET_REPOSITORY
 import json
 from github_issues.label_map import LabelMap
 
 
 class LabelHelper:
-    
-    def __init__(self, label_map_filename=None):
-        """The add label to issue seems broken in pygithub3, just use this for now"""
+
+    NUM_LABEL_WORKERS = 4
+    MAX_LABEL_RETRIES = 3
+    LABEL_CACHE_SIZE = 1000
+
+    def __init__(self, label_map_filename=None, provision_labels=True):
+        """The add label to issue seems broken in pygithub3, just use this for now
+
+        :param provision_labels: boolean.  If True, make sure the labels in the map exist on github, with the mapped colors
+        """
         self.auth = (GITHUB_LOGIN, GITHUB_PASSWORD_OR_PERSONAL_ACCESS_TOKEN)
         
         self.label_map_filename = label_map_filename
+        self.provision_labels = provision_labels
+
+        # { (status, tracker, priority, category, custom fields) : label names }, least recently used first
+        self.label_cache = OrderedDict()
+        self.label_cache_lock = threading.Lock()
+        self.label_cache_hits = 0
+        self.label_cache_misses = 0
         self.label_map = None
         self.using_label_map = False
         self.load_map()
@@ -33,71 +52,127 @@ class LabelHelper:
         
         self.label_map = LabelMap(self.label_map_filename)
         self.using_label_map = True
+
+        if self.provision_labels:
+            self.make_update_map_labels()
         
-        self.make_update_map_labels()
-        
+    def get_http_session(self):
+        return get_http_session()
         
+    def get_repo_labels(self):
+        """
+        List the labels in the github repository--all pages
+
+        :returns: { label name (lower case) : { "name" : ..., "color" : ... } }
+        """
+        repo_labels = {}
+        label_url = 'https://api.github.com/repos/%s/%s/labels' % (GITHUB_TARGET_USERNAME, GITHUB_TARGET_REPOSITORY)
+        params = dict(per_page=100)
+        while label_url:
+            req = self.get_http_session().get(label_url, params=params, auth=self.auth)
+            if not req.status_code == 200:
+                msgx('Failed to list the github labels.  status: %s\n%s' % (req.status_code, req.text))
+
+            for github_label_info in req.json():
+                repo_labels[github_label_info['name'].lower()] = github_label_info
+
+            label_url = req.links.get('next', {}).get('url', None)
+            params = None       # already in the "next" url
+
+        return repo_labels
+
+    def get_label_changes(self, repo_labels):
+        """
+        Compare the label map to the github labels
+
+        :param repo_labels: dict from get_repo_labels()
+        :returns: (labels to create, labels to update).  Lists of (label_info, existing github name)
+        """
+        to_create = []
+        to_update = []
+        checked = set()     # several redmine names may map to the same github label
+        for label_info in self.label_map.get_label_info_objects():
+            if label_info.github_label_name.lower() in checked:
+                continue
+            checked.add(label_info.github_label_name.lower())
+
+            github_label_info = repo_labels.get(label_info.github_label_name.lower(), None)
+            if github_label_info is None:
+                to_create.append((label_info, None))
+            elif not github_label_info.get('color', 'nope').lower() == label_info.github_label_color.lower():
+                to_update.append((label_info, github_label_info['name']))
+        return (to_create, to_update)
+
+    def save_label(self, label_info, existing_name=None):
+        """
+        Create the label or, if existing_name is given, update its color.  Failed calls are retried
+
+        :raises: Exception if the label couldn't be saved
+        """
+        data = json.dumps(dict(name=label_info.github_label_name\
+                            , color=label_info.github_label_color))
+        if existing_name is None:
+            label_url = 'https://api.github.com/repos/%s/%s/labels' % (GITHUB_TARGET_USERNAME, GITHUB_TARGET_REPOSITORY)
+            method = 'post'
+        else:
+            label_url = 'https://api.github.com/repos/%s/%s/labels/%s' % (GITHUB_TARGET_USERNAME, GITHUB_TARGET_REPOSITORY, existing_name)
+            method = 'patch'
+
+        for attempt in range(1, self.MAX_LABEL_RETRIES + 1):
+            try:
+                req = getattr(self.get_http_session(), method)(label_url, data=data, auth=self.auth)
+            except Exception as e:
+                err_msg = '%s' % e
+            else:
+                if req.status_code in [200, 201]:
+                    msg('Label %s: %s %s' % ('created' if existing_name is None else 'color updated'\
+                                            , label_info.github_label_name, label_info.github_label_color))
+                    return
+                if req.status_code == 422 and existing_name is None:
+                    return      # "already_exists"--e.g. made by another run
+                err_msg = 'status: %s %s' % (req.status_code, req.text)
+
+            if attempt < self.MAX_LABEL_RETRIES:
+                time.sleep(2 ** attempt)
+
+        raise Exception('Label %s failed for [%s]: %s' % (method, label_info.github_label_name, err_msg))
+
     def make_update_map_labels(self):
         """
         Go through the label make and make sure they all exist, with the appropriate colors
+
+        The github labels are listed once and compared to the label map.  Only the missing labels
+        and those with a different color are saved--a few at a time.  All of them are tried;
+        failures are reported at the end.
         """ 
         msgt('Match label map names/color to GitHub')   
-        
-        for label_info in self.label_map.get_label_info_objects():
-            
-            msg('\nCheck label: %s %s' % (label_info.github_label_name, label_info.github_label_color))
-
-            #  (1) try to get label
-            #
-            msg('  (1) Try to retrieve label')            
-            label_url = 'https://api.github.com/repos/%s/%s/labels/%s' % (GITHUB_TARGET_USERNAME, GITHUB_TARGET_REPOSITORY, label_info.github_label_name)
-            req = requests.get(label_url, auth=self.auth)
-            msg('url: %s' % label_url)
-            msg('status: %s' % req.status_code)
-            
-            #  (2) Label exists
-            if req.status_code == 200:
-                github_label_info = req.json()
-                msg('-- label exists\n %s' % github_label_info)
-                #print label_info
-                
-                # (2a) Color matches! -- all done
-                if github_label_info.get('color', 'nope') == label_info.github_label_color:
-                    msg('-- color matches!')
-                    continue
-                  
-                # (2b) Color doesn't match -- update color
-                msg('  (2b) Try to update label color')
-                label_url = 'https://api.github.com/repos/%s/%s/labels/%s' % (GITHUB_TARGET_USERNAME, GITHUB_TARGET_REPOSITORY, label_info.github_label_name)
-                data = dict(name=label_info.github_label_name\
-                            , color=label_info.github_label_color)
-                req = requests.patch(label_url, data=json.dumps(data), auth=self.auth)
-                if req.status_code == 200:
-                    msg('  Color updated!')
-                    msg(req.text)
-                    continue
-                msgx('Color updated failed!')
-            
-            # (3) Create new label with color
-            msg('  (3) Try to create label')
-            label_url = 'https://api.github.com/repos/%s/%s/labels' % (GITHUB_TARGET_USERNAME, GITHUB_TARGET_REPOSITORY)
-            data = dict(name=label_info.github_label_name\
-                        , color=label_info.github_label_color)
-            req = requests.post(label_url, data=json.dumps(data), auth=self.auth)
-            msg(req.text)
-            msg(req.status_code)
-            if req.status_code in [ 200, 201]:
-                msg('Label created with color!')
-                continue
-            else:
-                msgx('Create label with color failed!')
+
+        repo_labels = self.get_repo_labels()
+        to_create, to_update = self.get_label_changes(repo_labels)
+        msg('Labels in map: %s.  On github: %s.  To create: %s.  To update: %s' % \
+                (len(self.label_map.get_label_info_objects()), len(repo_labels), len(to_create), len(to_update)))
+
+        if not to_create and not to_update:
+            return
+
+        pool = WorkerPool(self.NUM_LABEL_WORKERS, name='label').start()
+        for label_info, existing_name in to_create + to_update:
+            pool.submit(self.save_label, label_info, existing_name, label=label_info.github_label_name)
+        pool.join()
+
+        if pool.errors:
+            for label_name, err_msg, err_trace in pool.errors:
+                msg('  %s' % err_msg)
+            msgx('Failed to save %s label(s).  Fix the problem and run again--labels already saved are skipped' % len(pool.errors))
+
+        msg('Labels saved: %s' % pool.completed_count)
         
         
     def clear_labels(self, issue_id):
         msgt('Clear Labels for an Issue.  Issue: [%s]' % (issue_id))
         #DELETE /repos/:owner/:repo/issues/:number/labels
         label_url = 'https://api.github.com/repos/%s/%s/issues/%s/labels' % (GITHUB_TARGET_USERNAME, GITHUB_TARGET_REPOSITORY, issue_id)
-        req = requests.delete(label_url, auth=self.auth)
+        req = self.get_http_session().delete(label_url, auth=self.auth)
         msg('labels deleted!') 
         
         
@@ -117,7 +192,7 @@ class LabelHelper:
         labels_for_call = json.dumps(labels)
         msg('labels: %s' % labels_for_call)
         
-        req = requests.post(label_url, auth=self.auth, data=labels_for_call) 
+        req = self.get_http_session().post(label_url, auth=self.auth, data=labels_for_call) 
 
         msg('result: %s' % req.text)
     
@@ -175,11 +250,62 @@ class LabelHelper:
         #msgx('blah')
         return mapped_label_names
             
+    def get_label_cache_key(self, redmine_issue_dict):
+        """
+        The label names only depend on the issue's status, tracker, priority, category and custom field names.
+        Many issues share the same combination.
+
+        :returns: tuple, or None if the issue isn't a dict
+        """
+        if not type(redmine_issue_dict) is dict:
+            return None
+
+        def get_name(info_dict):
+            if type(info_dict) is dict and 'id' in info_dict and 'name' in info_dict:
+                return info_dict['name']
+            return None
+
+        custom_fields = redmine_issue_dict.get('custom_fields', None) or []
+        return (get_name(redmine_issue_dict.get('status', None))\
+                , get_name(redmine_issue_dict.get('tracker', None))\
+                , get_name(redmine_issue_dict.get('priority', None))\
+                , get_name(redmine_issue_dict.get('category', None))\
+                , tuple([get_name(cf_dict) for cf_dict in custom_fields])\
+                )
+
     def get_label_names_from_issue(self, redmine_issue_dict):
+        """
+        :returns: list of github label names for the issue.  Memoized by get_label_cache_key()
+        """
+        cache_key = self.get_label_cache_key(redmine_issue_dict)
+        if cache_key is None:
+            return self.make_label_names_from_issue(redmine_issue_dict)
+
+        with self.label_cache_lock:
+            label_names = self.label_cache.pop(cache_key, None)
+            if label_names is not None:
+                self.label_cache[cache_key] = label_names       # most recently used
+                self.label_cache_hits += 1
+                return list(label_names)
+
+        label_names = self.make_label_names_from_issue(redmine_issue_dict)
+
+        with self.label_cache_lock:
+            self.label_cache_misses += 1
+            self.label_cache[cache_key] = tuple(label_names)
+            if len(self.label_cache) > self.LABEL_CACHE_SIZE:
+                self.label_cache.popitem(last=False)
+
+        return label_names
+
+    def make_label_names_from_issue(self, redmine_issue_dict):
         if self.using_label_map is True:
             return self.get_label_names_based_on_map(redmine_issue_dict)
         
         return self.get_label_names(redmine_issue_dict)
+
+    def show_label_cache_stats(self):
+        msg('Label cache: %s hits, %s misses, %s issue types' % (self.label_cache_hits, self.label_cache_misses, len(self.label_cache)))
     
     
     def get_label_names(self, redmine_issue_dict, non_formatted=False):
@@ -1,20 +1,168 @@
+"""
+Translate Redmine's Textile markup to GitHub flavored Markdown.
 
+The text is read once:
+    - <pre> blocks are copied as code blocks, without changes
+    - the other lines are translated one at a time: headings, lists, block quotes and tables
+    - inside a line, one pattern finds @code@, "links":http://..., *bold* and _italic_.
+      @code@ and bare urls, e.g. http://x.org/_private_/y, are passed through as they are
+
+Unlike a series of str.replace() calls, the result doesn't depend on the order of the rules.
+"""
+import re
+
+# Issue mentions, e.g. "see #1234"
+ISSUE_MENTION_PATTERN = re.compile(r'#(\d+)')
+
+# <pre>...</pre>, or <pre><code class="ruby">...</code></pre>.  An unclosed block goes to the end of the text
+PRE_PATTERN = re.compile(r'<pre>(?:\s*<code(?:\s+class="(?P<lang>[\w+#-]+)")?>)?(?P<code>.*?)(?:</code>\s*)?(?:</pre>|\Z)', re.DOTALL)
+
+HEADING_PATTERN = re.compile(r'^h([1-6])\.[ \t]*')
+BLOCK_QUOTE_PATTERN = re.compile(r'^bq\.[ \t]*')
+PARAGRAPH_PATTERN = re.compile(r'^p\.[ \t]+')
+LIST_PATTERN = re.compile(r'^([#*]+)[ \t]+')
+
+# Textile cell modifiers, e.g. "|_. header|" or "|>. right aligned|"
+TABLE_CELL_MODIFIER_PATTERN = re.compile(r'^(?:[_<>=^~]|\\\d+|/\d+)+\.[ \t]*')
+
+INLINE_PATTERN = re.compile(r'''
+      (?P<code>(?<![\w@])@(?P<code_text>[^@\n]+?)@(?![\w@]))
+    | (?P<link>"(?P<link_text>[^"\n]+)":(?P<link_url>(?:https?|ftp|mailto):[^\s"<>]*[^\s"<>.,;:!?)]))
+    | (?P<url>\b(?:(?:https?|ftp)://|mailto:|www\.)[^\s"<>]+)
+    | (?P<bold>(?<![\w*/])\*(?P<bold_text>[^*\s](?:[^*\n]*[^*\s])?)\*(?![\w*/]))
+    | (?P<italic>(?<![\w_/])_(?P<italic_text>[^_\s](?:[^_\n]*[^_\s])?)_(?![\w_/]))
+    ''', re.VERBOSE)
+
+
+def translate_inline_match(m):
+    if m.group('code'):
+        return '`%s`' % m.group('code_text')
+    if m.group('link'):
+        return '[%s](%s)' % (m.group('link_text'), m.group('link_url'))
+    if m.group('url'):
+        return m.group('url')
+    if m.group('bold'):
+        return '**%s**' % m.group('bold_text')
+    return '*%s*' % m.group('italic_text')
+
+
+def translate_inline(text):
+    return INLINE_PATTERN.sub(translate_inline_match, text)
+
+
+def is_table_row(line):
+    line = line.strip()
+    return len(line) > 1 and line.startswith('|') and line.endswith('|')
+
+
+def translate_table(rows):
+    """
+    :param rows: list of Textile table rows, e.g. ["|_. name |_. size |", "| a | 1 |"]
+    :returns: list of Markdown table rows.  The first row is the header
+    """
+    md_rows = []
+    for row in rows:
+        cells = row.strip()[1:-1].split('|')
+        cells = [translate_inline(TABLE_CELL_MODIFIER_PATTERN.sub('', x.strip())) for x in cells]
+        md_rows.append('| %s |' % ' | '.join(cells))
+        if len(md_rows) == 1:
+            md_rows.append('|%s' % (' --- |' * len(cells)))
+    return md_rows
+
+
+def translate_line(line):
+    """
+    Translate a line that isn't in a table or code block
+    """
+    m = HEADING_PATTERN.match(line)
+    if m:
+        return '#' * int(m.group(1)) + ' ' + translate_inline(line[m.end():])
+
+    m = LIST_PATTERN.match(line)
+    if m:
+        depth = len(m.group(1))
+        if m.group(1)[-1] == '#':
+            prefix = '   ' * (depth - 1) + '1. '
+        else:
+            prefix = '  ' * (depth - 1) + '* '
+        return prefix + translate_inline(line[m.end():])
+
+    m = BLOCK_QUOTE_PATTERN.match(line)
+    if m:
+        return '> ' + translate_inline(line[m.end():])
+
+    m = PARAGRAPH_PATTERN.match(line)
+    if m:
+        return translate_inline(line[m.end():])
+
+    return translate_inline(line)
+
+
+def translate_text(text):
+    """
+    Translate text without <pre> blocks, line by line
+    """
+    translated = []
+    table_rows = []
+    for line in text.split('\n'):
+        eol = ''
+        if line.endswith('\r'):
+            line, eol = line[:-1], '\r'
+
+        if is_table_row(line):
+            table_rows.append((line, eol))
+            continue
+        if table_rows:
+            translated += [x + table_rows[0][1] for x in translate_table([row for row, row_eol in table_rows])]
+            table_rows = []
+
+        translated.append(translate_line(line) + eol)
+
+    if table_rows:
+        translated += [x + table_rows[0][1] for x in translate_table([row for row, row_eol in table_rows])]
+
+    return '\n'.join(translated)
 
-def get_translate_dict():
-    d = {}
-    for hlevel in range(1, 7):
-        d['h%s.' % hlevel] = '#' * hlevel        # e.g. d['h2.'] = '##'
-    d['\n# '] = '\n1. '  # lists
-    d['<pre>'] = '```'  # code block
-    d['</pre>'] = '\n```'  # code block
-    return d
 
 def translate_for_github(content):
     if not content:
         return None
-    
-    for k, v in get_translate_dict().items():
-        content = content.replace(k, v)
 
-    return content
-    
+    translated = []
+    pos = 0
+    for m in PRE_PATTERN.finditer(content):
+        translated.append(translate_text(content[pos:m.start()]))
+        # the fences go on their own lines
+        translated.append('\n```%s\n%s\n```\n' % (m.group('lang') or '', m.group('code').strip('\r\n')))
+        pos = m.end()
+    translated.append(translate_text(content[pos:]))
+
+    return ''.join(translated)
+
+
+def rewrite_issue_mentions(content, redmine2github_issue_map):
+    """
+    Change redmine issue mentions, e.g. "see #1234", to the github issue numbers.
+    Mentions not in the map are left as they are.
+
+    :param redmine2github_issue_map: { redmine issue # (str) : github issue # }
+    """
+    if not content or not redmine2github_issue_map:
+        return content
+
+    return ISSUE_MENTION_PATTERN.sub(lambda m: '#{}'.format(redmine2github_issue_map.get(m.group(1), m.group(1))), content)
+
+
+if __name__=='__main__':
+    # regression cases
+    for textile, markdown in [\
+            ('before <pre><code class="ruby">puts 1</code></pre> after', 'before \n```ruby\nputs 1\n```\n after')\
+            , ('<pre>\na = 1\n</pre>', '\n```\na = 1\n```\n')\
+            , ('see http://x.org/_private_/y', 'see http://x.org/_private_/y')\
+            , ('see https://x.org/a*b*/c and www.x.org/_y_', 'see https://x.org/a*b*/c and www.x.org/_y_')\
+            , ('in /home/_private_/y', 'in /home/_private_/y')\
+            , ('@my_var_name@ is _italic_', '`my_var_name` is *italic*')\
+            , ('"docs":http://x.org/_a_ and *bold*', '[docs](http://x.org/_a_) and **bold**')\
+            ]:
+        assert translate_for_github(textile) == markdown, (textile, translate_for_github(textile))
+    print('ok')
@@ -0,0 +1,307 @@
+from __future__ import print_function
+import os, sys
+
+if __name__=='__main__':
+    SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.append(SRC_ROOT)
+
+import io
+import json
+try:
+    from urllib import quote
+except:
+    from urllib.parse import quote          # python 3.x
+import time
+import tarfile
+from datetime import datetime
+
+from settings.base import GITHUB_LOGIN, GITHUB_TARGET_USERNAME, GITHUB_TARGET_REPOSITORY
+from settings.base import REDMINE_ISSUES_DIRECTORY, USER_MAP_FILE, LABEL_MAP_FILE, MILESTONE_MAP_FILE, REDMINE_TO_GITHUB_MAP_FILE
+
+from github_issues.user_map_helper import UserMapHelper
+from github_issues.github_issue_maker import GithubIssueMaker
+from github_issues.relation_index import RelationIndex
+from redmine_ticket.issue_repository import get_issue_repository
+from utils.msg_util import *
+
+
+class MigrationArchiveExporter:
+    """
+    Write the downloaded Redmine issues as a GitHub migration archive--the .tar.gz
+    of JSON files used by GitHub's repository migrations--instead of calling the import API.
+
+    No GitHub API calls are made: the issues are streamed from the JSON files and rendered
+    with the same templates, label/milestone/user maps and markup translation as migrate_issues().
+
+    Archive contents:
+
+        schema.json
+        repositories_000001.json
+        users_000001.json
+        labels_000001.json
+        milestones_000001.json
+        issues_000001.json, issues_000002.json, ...                 (RECORDS_PER_FILE each)
+        issue_comments_000001.json, issue_comments_000002.json, ...
+
+    The GitHub issue numbers are the Redmine issue numbers, so related tickets and
+    issue mentions (e.g. "see #1234") don't need to be changed.
+    """
+
+    SCHEMA_VERSION = '1.0.1'
+    RECORDS_PER_FILE = 1000
+    DEFAULT_LABEL_COLOR = 'ededed'
+
+    def __init__(self, redmine_json_directory, archive_fname, **kwargs):
+        """
+        :param redmine_json_directory: str, directory with the downloaded redmine issues
+        :param archive_fname: str, the .tar.gz file to write
+        :param redmine2github_map_file: optional str.  If given, the { redmine issue # : github issue # } map is written
+                    to it, e.g. for the RedmineIssueUpdater
+        """
+        self.redmine_json_directory = redmine_json_directory
+        self.archive_fname = archive_fname
+        self.redmine2github_map_file = kwargs.get('redmine2github_map_file', None)
+
+        self.include_comments = kwargs.get('include_comments', True)
+        self.include_assignee = kwargs.get('include_assignee', True)
+        self.include_redmine_links = kwargs.get('include_redmine_links', True)
+
+        self.user_mapping_filename = kwargs.get('user_mapping_filename', None)
+        self.label_mapping_filename = kwargs.get('label_mapping_filename', None)
+        self.milestone_mapping_filename = kwargs.get('milestone_mapping_filename', None)
+
+        self.redmine_issue_start_number = kwargs.get('redmine_issue_start_number', 0)
+        self.redmine_issue_end_number = kwargs.get('redmine_issue_end_number', None)
+
+        self.repo_url = 'https://github.com/%s/%s' % (GITHUB_TARGET_USERNAME, GITHUB_TARGET_REPOSITORY)
+        self.export_time = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        self.user_urls = {}         # { github login : user url }
+        self.label_urls = {}        # { label name : label url }
+        self.milestone_numbers = {} # { milestone title : (number, due date) }
+
+        self.tar = None
+        self.file_counts = {}       # { model name, e.g. "issues" : number of files written }
+
+    def get_issue_maker(self):
+        user_map_helper = None
+        if self.user_mapping_filename:
+            user_map_helper = UserMapHelper(self.user_mapping_filename)
+
+        return GithubIssueMaker(user_map_helper=user_map_helper\
+                        , label_mapping_filename=self.label_mapping_filename\
+                        , milestone_mapping_filename=self.milestone_mapping_filename\
+                        , provision_labels=False\
+                        )
+
+    def get_user_url(self, github_login):
+        if not github_login:
+            github_login = GITHUB_LOGIN
+        if not github_login in self.user_urls:
+            self.user_urls[github_login] = 'https://github.com/%s' % github_login
+        return self.user_urls[github_login]
+
+    def get_author_login(self, gm, author_name):
+        """
+        :returns: str, github login of a redmine user from the user map.  None if not mapped
+        """
+        if not author_name or not gm.user_map_helper:
+            return None
+        return gm.user_map_helper.get_github_user(author_name, False)
+
+    def get_label_url(self, label_name):
+        if not label_name in self.label_urls:
+            # e.g. "Status: New" -> ".../labels/Status%3A%20New"
+            quoted_name = label_name
+            if not isinstance(quoted_name, bytes):
+                quoted_name = quoted_name.encode('utf-8')
+            quoted_name = quote(quoted_name, safe='')
+            self.label_urls[label_name] = '%s/labels/%s' % (self.repo_url, quoted_name)
+        return self.label_urls[label_name]
+
+    def get_milestone_url(self, title, due_date):
+        if not title:
+            return None
+        if not title in self.milestone_numbers:
+            self.milestone_numbers[title] = (len(self.milestone_numbers) + 1, due_date)
+        return '%s/milestones/%s' % (self.repo_url, self.milestone_numbers[title][0])
+
+    def add_json_file(self, model_name, records):
+        """
+        Add the next "(model_name)_00000N.json" file to the archive
+        """
+        if not records:
+            return
+        self.file_counts[model_name] = self.file_counts.get(model_name, 0) + 1
+        self.add_file('%s_%06d.json' % (model_name, self.file_counts[model_name]), records)
+
+    def add_file(self, fname, content):
+        data = json.dumps(content, indent=2).encode('utf-8')
+        tar_info = tarfile.TarInfo(fname)
+        tar_info.size = len(data)
+        tar_info.mtime = time.time()
+        self.tar.addfile(tar_info, io.BytesIO(data))
+
+    def make_issue_records(self, gm, rd, render_issue_map, relation_index):
+        """
+        :returns: (issue record, list of comment records)
+        """
+        issue_url = '%s/issues/%s' % (self.repo_url, rd['id'])
+
+        description, unresolved_tickets = gm.render_issue_description(rd, self.include_redmine_links, render_issue_map, relation_index)
+
+        author_login = self.get_author_login(gm, rd.get('author', {}).get('name', None))
+
+        assignees = []
+        if self.include_assignee:
+            assignee = gm.get_assignee(rd)
+            if assignee:
+                assignees.append(self.get_user_url(assignee))
+
+        mstone_name, due_date = gm.milestone_manager.get_milestone_name(rd)
+
+        closed_at = None
+        if gm.is_redmine_issue_closed(rd):
+            closed_at = rd.get('closed_on', None) or rd.get('updated_on', None)
+
+        issue_record = dict(type='issue'\
+                        , url=issue_url\
+                        , repository=self.repo_url\
+                        , user=self.get_user_url(author_login)\
+                        , title=rd.get('subject')\
+                        , body=description\
+                        , assignee=(assignees[0] if assignees else None)\
+                        , assignees=assignees\
+                        , milestone=self.get_milestone_url(mstone_name, due_date)\
+                        , labels=[self.get_label_url(x) for x in gm.label_helper.get_label_names_from_issue(rd)]\
+                        , reactions=[]\
+                        , created_at=rd.get('created_on', None)\
+                        , closed_at=closed_at\
+                        )
+
+        comment_records = []
+        if self.include_comments:
+            comments = gm.add_comments_for_issue(rd, render_issue_map)
+            comment_authors = gm.get_comment_author_names(rd)
+            for idx, comment in enumerate(comments):
+                comment_records.append(dict(type='issue_comment'\
+                                    , url='%s#issuecomment-%s%04d' % (issue_url, rd['id'], idx + 1)\
+                                    , issue=issue_url\
+                                    , user=self.get_user_url(self.get_author_login(gm, comment_authors[idx]))\
+                                    , body=comment['body']\
+                                    , reactions=[]\
+                                    , created_at=comment['created_at']\
+                                    ))
+
+        return (issue_record, comment_records)
+
+    def get_label_records(self, gm):
+        label_colors = {}
+        if gm.label_helper.using_label_map:
+            for label_info in gm.label_helper.label_map.get_label_info_objects():
+                label_colors[label_info.github_label_name] = label_info.github_label_color
+
+        return [dict(type='label'\
+                    , url=label_url\
+                    , name=label_name\
+                    , color=label_colors.get(label_name, self.DEFAULT_LABEL_COLOR)\
+                    , created_at=self.export_time)\
+                for label_name, label_url in sorted(self.label_urls.items())]
+
+    def get_milestone_records(self):
+        milestone_records = []
+        for title, (number, due_date) in sorted(self.milestone_numbers.items(), key=lambda x: x[1][0]):
+            due_on = None
+            if due_date:
+                due_on = due_date.strftime('%Y-%m-%dT%H:%M:%SZ')
+            milestone_records.append(dict(type='milestone'\
+                            , url='%s/milestones/%s' % (self.repo_url, number)\
+                            , repository=self.repo_url\
+                            , user=self.get_user_url(None)\
+                            , title=title\
+                            , description=''\
+                            , state='open'\
+                            , due_on=due_on\
+                            , created_at=self.export_time))
+        return milestone_records
+
+    def export_archive(self):
+        repository = get_issue_repository(self.redmine_json_directory)
+        issue_numbers = repository.get_issue_catalog().get_issue_numbers(self.redmine_issue_start_number, self.redmine_issue_end_number)
+        if not issue_numbers:
+            msgx('ERROR: No issues to export in directory [%s]' % self.redmine_json_directory)
+
+        gm = self.get_issue_maker()
+        relation_index = RelationIndex(repository)
+
+        # github numbers are the redmine numbers
+        redmine2github_issue_map = dict([(str(x), x) for x in issue_numbers])
+
+        # There's no migrate_related_tickets() pass after an archive import, so every related/child
+        # ticket is mapped--including those outside the exported range--and no issue loses its links
+        render_issue_map = dict(redmine2github_issue_map)
+        render_issue_map.update(dict([(str(x), x) for x in relation_index.get_linked_ticket_ids()]))
+
+        msgt('Write migration archive: %s' % self.archive_fname)
+        self.tar = tarfile.open(self.archive_fname, 'w:gz')
+
+        self.add_file('schema.json', dict(version=self.SCHEMA_VERSION))
+
+        issue_records = []
+        comment_records = []
+        issue_cnt = 0
+        for issue_num, rd in repository.iter_issues(self.redmine_issue_start_number, self.redmine_issue_end_number):
+            issue_cnt += 1
+            msg('(%s) Export redmine issue: [%s]' % (issue_cnt, issue_num))
+
+            issue_record, issue_comment_records = self.make_issue_records(gm, rd, render_issue_map, relation_index)
+            issue_records.append(issue_record)
+            comment_records += issue_comment_records
+
+            if len(issue_records) >= self.RECORDS_PER_FILE:
+                self.add_json_file('issues', issue_records)
+                issue_records = []
+            while len(comment_records) >= self.RECORDS_PER_FILE:
+                self.add_json_file('issue_comments', comment_records[:self.RECORDS_PER_FILE])
+                comment_records = comment_records[self.RECORDS_PER_FILE:]
+
+        self.add_json_file('issues', issue_records)
+        self.add_json_file('issue_comments', comment_records)
+
+        self.add_json_file('repositories', [dict(type='repository'\
+                                            , url=self.repo_url\
+                                            , owner=self.get_user_url(GITHUB_TARGET_USERNAME)\
+                                            , name=GITHUB_TARGET_REPOSITORY\
+                                            , has_issues=True\
+                                            , created_at=self.export_time)])
+        self.add_json_file('labels', self.get_label_records(gm))
+        self.add_json_file('milestones', self.get_milestone_records())
+        self.add_json_file('users', [dict(type='user', url=url, login=login)\
+                                        for login, url in sorted(self.user_urls.items())])
+        self.tar.close()
+        self.tar = None
+
+        if self.redmine2github_map_file:
+            fh = open(self.redmine2github_map_file, 'w')
+            fh.write(json.dumps(redmine2github_issue_map, indent=4))
+            fh.close()
+            msg('Map file written: %s' % self.redmine2github_map_file)
+
+        msg('Issues exported: %s' % issue_cnt)
+        msg('Archive written: %s' % self.archive_fname)
+
+
+if __name__=='__main__':
+    json_input_directory = os.path.join(REDMINE_ISSUES_DIRECTORY, '2018-0524')
+
+    kwargs = dict(include_comments=True,
+                include_assignee=False,
+                include_redmine_links=True,
+                #user_mapping_filename=USER_MAP_FILE, # optional
+                label_mapping_filename=LABEL_MAP_FILE, # optional
+                #milestone_mapping_filename=MILESTONE_MAP_FILE, # optional
+                redmine2github_map_file=REDMINE_TO_GITHUB_MAP_FILE,
+    )
+
+    exporter = MigrationArchiveExporter(json_input_directory, 'migration_archive.tar.gz', **kwargs)
+    exporter.export_archive()
@@ -7,13 +7,21 @@ if __name__=='__main__':
 import time
 import re
 import json
+import threading
 from datetime import datetime, timedelta
 from settings.base import get_github_auth, REDMINE_ISSUES_DIRECTORY, USER_MAP_FILE, LABEL_MAP_FILE, MILESTONE_MAP_FILE, REDMINE_TO_GITHUB_MAP_FILE
 
 
 from github_issues.user_map_helper import UserMapHelper
 from github_issues.github_issue_maker import GithubIssueMaker
+from github_issues.import_log import ImportLog
+from github_issues.relation_index import RelationIndex, RelatedUpdateState
+from github_issues.payload_pipeline import PayloadPipeline
+from redmine_ticket.issue_repository import get_issue_repository
+from redmine_ticket.issue_store import RedmineIssueStore
+from redmine_ticket.issue_pack import IssuePack
 from utils.msg_util import *
+from utils.worker_pool import WorkerPool
 
 
 class MigrationManager:
@@ -33,10 +41,33 @@ class MigrationManager:
         self.fix_issue_mentions = kwargs.get('fix_issue_mentions', False)
         self.insert_dummy_issues = kwargs.get('insert_dummy_issues', False)
 
+        # Compute the github issue numbers up front, from the repository's current issue count.
+        # Imports are then only spot-checked instead of polled.  Needs an idle repository:
+        # nobody else may create issues or pull requests during the migration
+        self.predict_github_numbers = kwargs.get('predict_github_numbers', False)
+
+        # Number of threads rendering the import payloads ahead of the import calls
+        self.num_render_workers = kwargs.get('num_render_workers', 4)
+
+        # Number of import calls made at the same time.  Only used if insert_dummy_issues is False:
+        # the github issue numbers then won't follow the order of the redmine issues
+        self.num_import_workers = kwargs.get('num_import_workers', 1)
+
         self.user_mapping_filename = kwargs.get('user_mapping_filename', None)
         self.label_mapping_filename = kwargs.get('label_mapping_filename', None)
         self.milestone_mapping_filename = kwargs.get('milestone_mapping_filename', None)
 
+        # Optional SQLite file written by the RedmineIssueDownloader.  If given, the issues are read
+        # from it instead of the JSON files.  redmine_json_directory is then only used as a name
+        self.issue_store_fname = kwargs.get('issue_store_fname', None)
+        self.issue_store = None
+
+        # Or the downloader's pack file (and its .idx)
+        self.issue_pack_fname = kwargs.get('issue_pack_fname', None)
+
+        # Make every milestone in the milestone map, with its due date, before the import loop
+        self.provision_milestones = kwargs.get('provision_milestones', False)
+
         # Start loading with issue number (int) based on json file name
         self.redmine_issue_start_number = kwargs.get('redmine_issue_start_number', 0)
 
@@ -44,25 +75,50 @@ class MigrationManager:
         #       None = go to the end
         self.redmine_issue_end_number = kwargs.get('redmine_issue_end_number', None)
 
+        # Catalog of the redmine JSON files.  Built once, on first use
+        self.issue_catalog = None
+
+        # Each accepted import is logged right away.  A rerun skips the issues already imported
+        self.import_log = ImportLog(ImportLog.get_log_fname(self.redmine2github_map_file))
+
     def does_redmine_json_directory_exist(self):
         if not os.path.isdir(self.redmine_json_directory):
             return False
         return True
 
-    def get_redmine_json_fnames(self):
-        if not self.does_redmine_json_directory_exist():
+    def get_issue_repository(self):
+        """
+        :returns: RedmineIssueRepository.  Each issue file is parsed once, for all the migration steps
+        """
+        if self.issue_store_fname:
+            if self.issue_store is None:
+                if not os.path.isfile(self.issue_store_fname):
+                    msgx('ERROR: Issue store does not exist: %s' % self.issue_store_fname)
+                self.issue_store = RedmineIssueStore(self.issue_store_fname)
+        elif self.issue_pack_fname:
+            if self.issue_store is None:
+                if not os.path.isfile(self.issue_pack_fname):
+                    msgx('ERROR: Issue pack does not exist: %s' % self.issue_pack_fname)
+                self.issue_store = IssuePack(self.issue_pack_fname)
+        elif not self.does_redmine_json_directory_exist():
             msgx('ERROR: Directory does not exist: %s' % self.redmine_json_directory)
+        return get_issue_repository(self.redmine_json_directory, issue_store=self.issue_store)
 
-        pat ='^\d{1,10}\.json$'
-        fnames = [x for x in os.listdir(self.redmine_json_directory) if re.match(pat, x)]
-        fnames.sort()
-        return fnames
+    def get_issue_catalog(self):
+        """
+        :returns: RedmineIssueCatalog.  The directory is only listed the first time
+        """
+        if self.issue_catalog is None:
+            self.issue_catalog = self.get_issue_repository().get_issue_catalog()
+        return self.issue_catalog
+
+    def get_redmine_json_fnames(self):
+        return self.get_issue_catalog().get_fnames()
 
 
     def sanity_check(self):
         # Is there a redmine JSON file directory with JSON files?
-        fnames = self.get_redmine_json_fnames()
-        if len(fnames)==0:
+        if self.get_issue_catalog().get_issue_count()==0:
             msgx('ERROR: Directory [%s] does contain any .json files' % self.redmine_json_directory)
 
         for mapping_filename in [self.user_mapping_filename, self.label_mapping_filename, self.milestone_mapping_filename ]:
@@ -121,41 +177,121 @@ class MigrationManager:
 
 
     def migrate_related_tickets(self):
-        """ After github issues are already migrated, go back and udpate the descriptions to include related tickets """
+        """ After github issues are already migrated, go back and udpate the descriptions to include related tickets
+
+        The related and child tickets come from a RelationIndex built from the local JSON files, so
+        only issues that have related tickets are visited.  The section added to each github issue
+        is hashed and saved; on a rerun, issues whose section hasn't changed are skipped.
+        """
 
         gm = GithubIssueMaker()
 
         issue_cnt = 0
         redmine2github_issue_map = self.get_dict_from_map_file()
-
-        for json_fname in self.get_redmine_json_fnames():
-
-            # Pull the issue number from the file name
-            redmine_issue_num = int(json_fname.replace('.json', ''))
-
-            # Start processing at or after redmine_issue_START_number
-            if not redmine_issue_num >= self.redmine_issue_start_number:
-                msg('Skipping Redmine issue: %s (start at %s)' % (redmine_issue_num, self.redmine_issue_start_number ))
-                continue        # skip Attempt to create issue
-                # his
-
-            # Don't process after the redmine_issue_END_number
-            if self.redmine_issue_end_number:
-                if redmine_issue_num > self.redmine_issue_end_number:
-                    print(redmine_issue_num, self.redmine_issue_end_number)
-                    break
+        catalog = self.get_issue_catalog()
+        relation_index = RelationIndex(self.get_issue_repository())
+        update_state = RelatedUpdateState(RelatedUpdateState.get_state_fname(self.redmine2github_map_file))
+
+        # Issues imported with their related tickets already in the description
+        import_entries = self.import_log.load()
+
+        issue_numbers = set(relation_index.get_linked_issue_numbers(self.redmine_issue_start_number, self.redmine_issue_end_number))
+        if self.fix_issue_mentions:
+            # issue mentions may be in any issue--apart from those rewritten at import time or by an earlier run
+            issue_numbers.update([x for x in catalog.get_issue_numbers(self.redmine_issue_start_number, self.redmine_issue_end_number)\
+                                    if not import_entries.get(x, {}).get('mentions_rewritten')\
+                                        and not update_state.are_mentions_rewritten(x)])
+        issue_numbers = sorted([x for x in issue_numbers if catalog.has_issue(x)])
+
+        for redmine_issue_num in issue_numbers:
+
+            json_fname = catalog.get_fname(redmine_issue_num)
+
+            import_entry = import_entries.get(redmine_issue_num, {})
+            fix_issue_mentions = self.fix_issue_mentions and not import_entry.get('mentions_rewritten')\
+                                    and not update_state.are_mentions_rewritten(redmine_issue_num)
+
+            if import_entry.get('links_embedded') and not fix_issue_mentions:
+                msg('Related tickets added at import: %s' % redmine_issue_num)
+                continue
+
+            related_info = gm.get_related_issue_info(None, redmine2github_issue_map\
+                                    , related_ids=relation_index.get_related_ids(redmine_issue_num)\
+                                    , child_ids=relation_index.get_child_ids(redmine_issue_num))
+
+            section_hash = None
+            related_section = gm.render_related_issues('', related_info, self.include_redmine_links)
+            if related_section is not None:
+                section_hash = RelatedUpdateState.get_section_hash(related_section)
+                if update_state.is_unchanged(redmine_issue_num, section_hash) and not fix_issue_mentions:
+                    msg('Related tickets unchanged: %s' % redmine_issue_num)
+                    continue
+            elif not fix_issue_mentions:
+                continue    # none of the related tickets are on github
 
             issue_cnt += 1
 
             msgt('(%s) Loading redmine issue: [%s] from file [%s]' % (issue_cnt, redmine_issue_num, json_fname))
 
-            json_fname_fullpath = os.path.join(self.redmine_json_directory, json_fname)
+            json_fname_fullpath = catalog.get_fullpath(redmine_issue_num)
 
             try:
-                gm.update_github_issue_with_related(json_fname_fullpath, redmine2github_issue_map, self.include_redmine_links, self.fix_issue_mentions)
+                updated = gm.update_github_issue_with_related(json_fname_fullpath, redmine2github_issue_map, self.include_redmine_links, fix_issue_mentions\
+                                    , related_info=related_info\
+                                    , on_mentions_rewritten=update_state.set_mentions_rewritten)
             except Exception as e:
                 msg("Failed to update github issue with related")
-                pass
+                continue
+
+            if updated and section_hash is not None:
+                update_state.set_hash(redmine_issue_num, section_hash)
+
+        self.get_issue_repository().show_stats()
+
+    def is_parallel_import(self):
+        return self.num_import_workers > 1 and not self.insert_dummy_issues
+
+    def get_predicted_github_numbers(self, gm, issue_numbers, already_imported, unresolved, rm_gh_id_map):
+        """
+        Issues are imported one at a time, in order, so in an idle repository the github numbers
+        follow on from the highest existing issue number.
+
+        That number is taken from the map file/import log.  Github can't list the issues by number
+        (imported issues keep their redmine dates), so the api is only used to check that the repository
+        has nothing newer--or, with an empty map, that it has no issues at all.
+
+        :param rm_gh_id_map: { redmine issue num : github issue num }, from the map file and the import log
+        :returns: { redmine issue num : predicted github issue num }.  Empty dict if the numbers can't be predicted
+        """
+        if unresolved:
+            msgt('Not predicting github issue numbers: %s imports from an earlier run are unresolved' % len(unresolved))
+            return {}
+
+        highest_mapped_num = max([int(x) for x in rm_gh_id_map.values() if x] or [0])
+        newest_github_num = gm.get_highest_issue_number()
+        if highest_mapped_num:
+            if newest_github_num > highest_mapped_num:
+                msgt('Not predicting github issue numbers: github issue %s is not in the map file' % newest_github_num)
+                return {}
+        elif newest_github_num:
+            msgt('Not predicting github issue numbers: the repository already has issues that are not in the map file')
+            return {}
+        next_github_num = highest_mapped_num + 1
+
+        predicted_rm_gh_map = {}
+        for redmine_issue_num in issue_numbers:
+            if redmine_issue_num in already_imported:
+                continue
+            predicted_rm_gh_map[redmine_issue_num] = next_github_num
+            next_github_num += 1
+
+        if self.insert_dummy_issues and predicted_rm_gh_map:
+            first_num = min(predicted_rm_gh_map.keys())
+            if not predicted_rm_gh_map[first_num] == first_num:
+                msgt('Warning: redmine issue %s will become github issue %s.  The numbers will not match' % (first_num, predicted_rm_gh_map[first_num]))
+
+        msg('Predicted github issue numbers for %s issues' % len(predicted_rm_gh_map))
+        return predicted_rm_gh_map
 
     def migrate_issues(self):
 
@@ -170,110 +306,178 @@ class MigrationManager:
                         , milestone_mapping_filename=self.milestone_mapping_filename
                          )
 
+        if self.provision_milestones:
+            gm.milestone_manager.provision_milestones()
+
         # Iterate through json files
         issue_cnt = 0
         import_start_time = (datetime.utcnow() - timedelta(seconds = 10)).strftime("%Y-%m-%dT%H:%M:%SZ")
 
         rm_gh_id_map = self.get_dict_from_map_file()    # { redmine issue : github issue }
 
+        # Reconcile with the import log: skip issues already imported,
+        # and pick up the github numbers of imports still unresolved from an earlier run
+        already_imported = self.import_log.get_imported_entries()
+        rm_gh_id_map.update(self.import_log.get_redmine2github_map())
+        if already_imported:
+            msgt('Import log: %s issues already imported (%s)' % (len(already_imported), self.import_log.log_fname))
+
         # temporary IDs assigned by github during issue import
         # we need to map these to redmine IDs, so they can be mapped to github issue numbers later
         gh_import_rm_map = dict()
+        unresolved = self.import_log.get_unresolved_entries()
+        for redmine_issue_num, entry in unresolved.items():
+            gh_import_rm_map[entry['import_id']] = redmine_issue_num
+        if unresolved:
+            earliest = min([x['logged_at'] for x in unresolved.values()])
+            import_start_time = (datetime.utcfromtimestamp(earliest) - timedelta(seconds = 10)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        catalog = self.get_issue_catalog()
         if self.insert_dummy_issues:
-            loop_start = self.redmine_issue_start_number
-            loop_end = self.redmine_issue_end_number + 1
+            # every number in the range: the gaps become dummy issues
+            loop_end = self.redmine_issue_end_number
+            if loop_end is None:
+                loop_end = catalog.get_max_issue_number()
+            issue_numbers = range(self.redmine_issue_start_number, loop_end + 1)
+            msg('Dummy issues to insert: %s' % len(catalog.get_gaps(self.redmine_issue_start_number, loop_end)))
         else:
-            loop_start = 0
-            loop_end = len(self.get_redmine_json_fnames())
-
-        for i in range(loop_start, loop_end):
-
-            if not self.insert_dummy_issues:
-                json_fname = self.get_redmine_json_fnames()[i]
-                # Pull the issue number from the file name
-                redmine_issue_num = int(json_fname.replace('.json', ''))
-
-                # Start processing at or after redmine_issue_START_number
-                if not redmine_issue_num >= self.redmine_issue_start_number:
-                    msg('Skipping Redmine issue: %s (start at %s)' % (redmine_issue_num, self.redmine_issue_start_number ))
-                    continue # skip attempt to create issue
-
-                # Don't process after the redmine_issue_END_number
-                if self.redmine_issue_end_number:
-                    if redmine_issue_num > self.redmine_issue_end_number:
-                        print(redmine_issue_num, self.redmine_issue_end_number)
-                        break
-            else:
-                redmine_issue_num = i
-
-                # check if issue num exists in json files
-                have_file = False
-                json_fname = None
-                for fn in self.get_redmine_json_fnames():
-                    if redmine_issue_num == int(fn.replace('.json', '')):
-                        json_fname = fn
-                        break
-
-            issue_cnt += 1
-
-            if json_fname:
-
-                msgt('(%s) Loading redmine issue: [%s] from file [%s]' % (issue_cnt, redmine_issue_num, json_fname))
-                json_fname_fullpath = os.path.join(self.redmine_json_directory, json_fname)
-                gm_kwargs = { 'include_assignee' : self.include_assignee \
-                             , 'include_comments' : self.include_comments \
-                             , 'include_redmine_links' : self.include_redmine_links \
-                            }
-
-                [ http_status, github_response, reset_epoch ] = gm.make_github_issue(json_fname_fullpath, **gm_kwargs)
+            issue_numbers = catalog.get_issue_numbers(self.redmine_issue_start_number, self.redmine_issue_end_number)
 
+        # { redmine issue : predicted github issue }
+        predicted_rm_gh_map = {}
+        if self.predict_github_numbers:
+            if self.is_parallel_import():
+                msgt('Not predicting github issue numbers: parallel imports are not numbered in order')
+            else:
+                predicted_rm_gh_map = self.get_predicted_github_numbers(gm, issue_numbers, already_imported, unresolved, rm_gh_id_map)
+
+        # With predicted numbers, related tickets are added to the description at import time
+        # and issue mentions are changed to the github numbers
+        embed_map = None
+        relation_index = None
+        if predicted_rm_gh_map:
+            embed_map = dict([(str(k), v) for k, v in rm_gh_id_map.items()])
+            embed_map.update(dict([(str(k), v) for k, v in predicted_rm_gh_map.items()]))
+            # same related tickets as migrate_related_tickets()
+            relation_index = RelationIndex(self.get_issue_repository())
+        links_embedded = set()      # redmine issue #'s
+        mentions_rewritten = set()  # redmine issue #'s
+
+        gm_kwargs = { 'include_assignee' : self.include_assignee \
+                     , 'include_comments' : self.include_comments \
+                     , 'include_redmine_links' : self.include_redmine_links \
+                     , 'redmine2github_issue_map' : embed_map \
+                     , 'relation_index' : relation_index \
+                    }
+
+        def render_payload(redmine_issue_num):
+            # runs on a renderer thread
+            if not catalog.has_issue(redmine_issue_num):
+                return None     # no file for this issue number: dummy issue
+            return gm.build_issue_data(catalog.get_fullpath(redmine_issue_num), **gm_kwargs)
+
+        # Payloads are rendered ahead on other threads, and imported here in issue number order
+        issue_numbers = [x for x in issue_numbers if not x in already_imported]
+        pipeline = PayloadPipeline(issue_numbers, render_payload, num_workers=self.num_render_workers).start()
+
+        def import_payload(redmine_issue_num, payload):
+            # runs on an import thread in parallel mode
+            if payload is not None:
+                issue_data, unresolved_tickets = payload
+                [ http_status, github_response, reset_epoch ] = gm.import_issue(issue_data)
             else:
-
-                msgt('(%s) Creating dummy issue: [%s]' % (issue_cnt, redmine_issue_num))
                 [ http_status, github_response, reset_epoch ] = gm.make_dummy_issue()
 
+            # Note: rate limits are handled by the GithubIssueMaker's rate limiter
             if http_status != 200 and http_status != 202:
-
-                # if rate limit exceeded, wait until reset
-                if "API rate limit exceeded" in github_response['message']:
-                    reset_time = datetime.fromtimestamp(int(reset_epoch)) - datetime.now()
-                    msg("Api limit exceeded, will reset in {}".format(reset_time))
-                    reset_time += timedelta(seconds=10)
-                    msg("Sleeping for {} seconds".format(reset_time.seconds))
-                    time.sleep(reset_time.seconds)
-                    if json_fname:
-                        [ http_status, github_response, reset_epoch ] = gm.make_github_issue(json_fname_fullpath, **gm_kwargs)
-                    else:
-                        [ http_status, github_response, reset_epoch ] = gm.make_dummy_issue()
-
-                if http_status != 200 and http_status != 202:
-                    msgx('Error importing issue. github http response status %s. json received: %s' % (http_status, github_response))
+                msgx('Error importing issue. github http response status %s. json received: %s' % (http_status, github_response))
 
             print(github_response)
             github_import_num = github_response['id']
 
-            gh_import_rm_map[github_import_num] = redmine_issue_num
+            with import_lock:
+                gh_import_rm_map[github_import_num] = redmine_issue_num
+                if payload is not None and embed_map is not None:
+                    mentions_rewritten.add(redmine_issue_num)
+                    if not unresolved_tickets:
+                        links_embedded.add(redmine_issue_num)
+            self.import_log.append(redmine_issue_num, github_import_num, github_response.get('status')\
+                                    , dummy=(payload is None))
+
+        # Parallel mode: the github numbers don't follow the redmine numbers.
+        # The imports are matched up afterwards by their import id
+        import_lock = threading.Lock()
+        import_pool = None
+        if self.is_parallel_import():
+            msgt('Importing with %s parallel requests' % self.num_import_workers)
+            import_pool = WorkerPool(self.num_import_workers, name='issue-import').start()
+
+        for redmine_issue_num, payload in pipeline:
 
-            # Need to keep issue imports to under 180 per minute, so pause every other issue
-            if issue_cnt % 2 == 0:
-                msgt('sleep 1 seconds....')
-                time.sleep(1)
+            issue_cnt += 1
 
-            # Also need to keep under 5000 total api calls every hour
-            if issue_cnt % 50 == 0:
-                msgt('sleep 1 seconds....')
-                time.sleep(1)
+            if payload is not None:
+                msgt('(%s) Importing redmine issue: [%s] from file [%s]' % (issue_cnt, redmine_issue_num, catalog.get_fname(redmine_issue_num)))
+            else:
+                msgt('(%s) Creating dummy issue: [%s]' % (issue_cnt, redmine_issue_num))
 
+            if import_pool is not None:
+                import_pool.submit(import_payload, redmine_issue_num, payload, label=redmine_issue_num)
+            else:
+                import_payload(redmine_issue_num, payload)
 
-        # get ids that have been imported since the start time
-        import_to_id_map = gm.get_github_ids(import_start_time)
-        print(import_to_id_map)
-        for import_num, id_num in import_to_id_map.iteritems():
+        if import_pool is not None:
+            import_pool.join()
+
+        gm.rate_limiter.show_stats()
+        gm.label_helper.show_label_cache_stats()
+        self.get_issue_repository().show_stats()
+
+        # get ids that have been imported since the start time.
+        # Each github issue number is logged as soon as it is known
+        predictions_confirmed = []
+        def on_resolved(import_num, id_num):
+            if not import_num in gh_import_rm_map:
+                return  # not one of ours, e.g. from another script
             # look up the redmine ticket number from the import number, then map that to the final github issue id
-            rm_gh_id_map.update({ gh_import_rm_map[import_num] : id_num})
-        #mapping_dict.update({ redmine_issue_num : github_issue_number})
+            redmine_issue_num = gh_import_rm_map[import_num]
+            rm_gh_id_map.update({ str(redmine_issue_num) : id_num})
+            self.import_log.append(redmine_issue_num, import_num, 'imported', github_issue_num=id_num\
+                                    , links_embedded=(bool(predictions_confirmed) and redmine_issue_num in links_embedded)\
+                                    , mentions_rewritten=(bool(predictions_confirmed) and redmine_issue_num in mentions_rewritten))
+
+        failed_imports = {}     # { redmine issue num : github response }
+        def on_failed(import_num, github_response):
+            if not import_num in gh_import_rm_map:
+                return  # not one of ours
+            # logged as failed: a rerun imports the issue again
+            redmine_issue_num = gh_import_rm_map[import_num]
+            failed_imports[redmine_issue_num] = github_response
+            self.import_log.append(redmine_issue_num, import_num, ImportLog.STATUS_FAILED)
+
+        predicted_id_map = dict([(import_num, predicted_rm_gh_map[rm_num]) for import_num, rm_num in gh_import_rm_map.items()\
+                                    if rm_num in predicted_rm_gh_map])
+        if predicted_id_map and gm.spot_check_github_ids(predicted_id_map):
+            predictions_confirmed.append(True)
+            for import_num, id_num in predicted_id_map.items():
+                on_resolved(import_num, str(id_num))
+        else:
+            if predicted_id_map:
+                msgt('Predicted github issue numbers drifted.  Checking every import')
+                if links_embedded:
+                    msg('Warning: related tickets and issue mentions were added to %s issues using the predicted numbers.  Check them by hand' % len(mentions_rewritten))
+            gm.get_github_ids(import_start_time, import_ids=list(gh_import_rm_map.keys()), on_resolved=on_resolved, on_failed=on_failed)
         self.save_dict_to_file(rm_gh_id_map)
 
+        # The map file is saved first: a rerun only retries the failed imports
+        if import_pool is not None:
+            for redmine_issue_num, err_msg, err_trace in import_pool.errors:
+                failed_imports[redmine_issue_num] = err_msg
+        if failed_imports:
+            for redmine_issue_num in sorted(failed_imports.keys()):
+                msg('Failed to import redmine issue %s: %s' % (redmine_issue_num, failed_imports[redmine_issue_num]))
+            msgx('%s issue(s) failed to import.  Run again to retry them' % len(failed_imports))
+
 
 if __name__=='__main__':
     json_input_directory = os.path.join(REDMINE_ISSUES_DIRECTORY, '2018-0524')
@@ -288,11 +492,25 @@ if __name__=='__main__':
                 include_redmine_links=True,
                 # Optional. will look through github issues and map mentions
                 # (e.g. see #1234) to the correct github isse. This is expensive in terms of API calls.
+                # Not needed for issues imported with predict_github_numbers: their mentions are changed before the import
                 fix_issue_mentions=False,
                 # Will insert blank dummy issues to preserve redmine issue numbers (exclusive with fix_issue_mentions)
                 insert_dummy_issues=True,
+                # Optional. Compute the github issue numbers up front and only spot-check them after the import.
+                # Nobody else may create issues or pull requests in the repo during the migration
+                predict_github_numbers=False,
+                # Optional. Threads rendering the import payloads while the previous issues are imported
+                #num_render_workers=4,
+                # Optional. Parallel import calls when insert_dummy_issues=False--the github numbers won't follow redmine's order
+                #num_import_workers=4,
                 label_mapping_filename=LABEL_MAP_FILE, # optional
                 #milestone_mapping_filename=MILESTONE_MAP_FILE, # optional
+                # Optional. Create all the mapped milestones, with due dates, before the import
+                #provision_milestones=True,
+                # Optional. Read the issues from the downloader's SQLite file instead of the JSON files
+                #issue_store_fname=os.path.join(REDMINE_ISSUES_DIRECTORY, 'redmine_issues.sqlite3'),
+                # Optional. Or read them from the downloader's pack file
+                #issue_pack_fname=os.path.join(REDMINE_ISSUES_DIRECTORY, 'redmine_issues.pack'),
     )
 
     mm = MigrationManager(json_input_directory, REDMINE_TO_GITHUB_MAP_FILE, **kwargs)
@@ -3,6 +3,7 @@ import os
 import sys
 import json
 import csv
+import threading
 
 if __name__=='__main__':
     SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -54,6 +55,9 @@ class MilestoneHelper:
         
         self.milestone_lookup = {}    # { redmine_name : LabelInfo }
         self.using_milestone_map = False
+
+        self.milestone_numbers = None   # { github milestone title : milestone number }, read once from github
+        self.lock = threading.Lock()
         
         self.load_milestone_lookup()
         
@@ -96,50 +100,80 @@ class MilestoneHelper:
             self.github_conn = pygithub3.Github(**get_github_auth())
         return self.github_conn
         
-    def get_create_milestone_number(self, title):
+    def load_milestone_numbers(self):
+        """Read all the github milestones--open and closed--once.
+        After this, milestone numbers are looked up without an API call
+        """
+        milestone_numbers = {}
+        for state in ('open', 'closed'):
+            for page in self.get_milestones_service().list(state=state):
+                for resource in page:
+                    milestone_numbers[resource.title] = resource.number
+
+        msg('Github milestones loaded: %s' % len(milestone_numbers))
+        return milestone_numbers
+
+    def get_milestone_numbers(self):
+        if self.milestone_numbers is None:
+            with self.lock:
+                if self.milestone_numbers is None:
+                    self.milestone_numbers = self.load_milestone_numbers()
+        return self.milestone_numbers
+
+    def get_create_milestone_number(self, title, due_date=None):
         """Given a milestone title, retrieve the milestone number.
         If the milestone doesn't exist, then create it and return the new number
+
+        :param due_date: optional datetime, used if the milestone is created
         """
         if not title:
             return None
-        
+
         mnum = self.get_mile_stone_number(title)
         if mnum:
             return mnum
-        
-        
-        mstone = self.get_milestones_service().create({'title': title})
-    
+
+        with self.lock:
+            # made by another thread?
+            mnum = self.milestone_numbers.get(title, None)
+            if mnum:
+                return mnum
+
+            mstone_data = {'title': title}
+            if due_date:
+                mstone_data['due_on'] = due_date.strftime('%Y-%m-%dT%H:%M:%SZ')
+            mstone = self.get_milestones_service().create(mstone_data)
+            msg('Milestone created: [%s] #%s' % (title, mstone.number))
+
+            self.milestone_numbers[title] = mstone.number
+
         return mstone.number
-    
+
     def get_mile_stone_number(self, title):
         """Given a milestone title, retrieve the milestone number.
-        
+
         :param title: str, the title of the milestone
         :returns: int or None.  The milestone number or None, if the milestone is not found
         """
-        
+
         if not title:
             return None
-        
-        milestones = self.get_milestones_service().list()
-        """
-        for page in milestones:
-            print('--page--')
-            for resource in page:
-                print('--resource--')
-                print (resource)
-                print (resource.number)
-                print (resource.title)
-        return
+
+        return self.get_milestone_numbers().get(title, None)
+
+    def provision_milestones(self):
+        """Make every milestone in the milestone map--with its due date--before the import starts.
+        Milestones that already exist are left as they are.
         """
-        for page in milestones:
-            for resource in page:
-                if resource.title == title:
-                    return resource.number
-        return None
-    
-    
+        if not self.using_milestone_map:
+            return
+
+        for redmine_name, mstone_info in sorted(self.milestone_lookup.items()):
+            self.get_create_milestone_number(mstone_info.name, mstone_info.due_date)
+
+        msg('Milestones provisioned: %s' % len(self.milestone_lookup))
+
+
     def get_milestones_service(self):
         
         if self.milestone_service is None:
@@ -151,40 +185,46 @@ class MilestoneHelper:
         return self.milestone_service
        
    
-    def get_create_milestone(self, redmine_issue_dict):
-        # Add milestones!
-        #
+    def get_milestone_name(self, redmine_issue_dict):
+        """
+        :returns: (github milestone title, due date) for the issue's "fixed_version".
+                The title comes from the milestone map, if there is one.  (None, None) if there isn't a "fixed_version"
+        """
         # "fixed_version": {
-        #    "id": 96, 
+        #    "id": 96,
         #    "name": "4.0 - review for weekly assignment"
         # },
         #
         if not type(redmine_issue_dict) is dict:
-            return None
+            return (None, None)
+
+        fixed_version = redmine_issue_dict.get('fixed_version', None) or {}
+        mstone_name = fixed_version.get('name', None)
+        if not mstone_name:
+            return (None, None)
+
+        msg('Milestone: %s' % mstone_name)
+        if self.using_milestone_map:
+            mstone_info = self.milestone_lookup.get(mstone_name, None)
+            if mstone_info is None:
+                msgt('Milestone not found in map: %s' % mstone_name)
+            else:
+                return (mstone_info.name, mstone_info.due_date)
 
-        fixed_version = redmine_issue_dict.get('fixed_version', {})
-        if not fixed_version.has_key('name'):
+        return (mstone_name, None)       # Use original name
+
+    def get_create_milestone(self, redmine_issue_dict):
+        # Add milestones!
+        #
+        mstone_name, due_date = self.get_milestone_name(redmine_issue_dict)
+        if not mstone_name:
             return None
 
+        milestone_number = self.get_create_milestone_number(mstone_name, due_date)
+        if not milestone_number:
+            msgx('Milestone number not found for: [%s]' % mstone_name)
 
-        mstone_name = fixed_version['name']
-        msg('Milestone: %s' % mstone_name)
-        if mstone_name: 
-            if self.using_milestone_map:
-                mstone_info = self.milestone_lookup.get(mstone_name, None)
-                if mstone_info is None:
-                    msgt('Milestone not found in map: %s' % mstone_name)
-                    mstone_name = mstone_name       # Use original name
-                else:
-                    mstone_name = mstone_info.name
-            
-            milestone_number = self.get_create_milestone_number(mstone_name)
-            if not milestone_number:
-                msgx('Milestone number not found for: [%s]' % mstone_name)
-
-            return milestone_number
-
-        return None
+        return milestone_number
 
         # Add milestone to issue
         #        mstone_dict =  { 'milestone' : milestone_number}
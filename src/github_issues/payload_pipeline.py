@@ -0,0 +1,93 @@
+from __future__ import print_function
+import sys
+import threading
+import traceback
+
+from utils.msg_util import *
+from utils.worker_pool import WorkerPool
+
+
+class PayloadPipeline:
+    """
+    Render the github import payloads a few issues ahead of the import calls.
+
+    A pool of threads calls render_func for the upcoming issues--parsing the JSON, rendering the
+    description and comment templates--while the caller is waiting on the github API.
+    The results are handed back in the order of the issue numbers, whatever order they finish in,
+    so the github issue numbers still follow the redmine numbers (e.g. with dummy issues).
+
+    At most "max_ahead" rendered payloads are held at a time.
+
+        pipeline = PayloadPipeline(issue_numbers, render_func).start()
+        for issue_num, payload in pipeline:
+            ... import the payload ...
+    """
+
+    def __init__(self, issue_numbers, render_func, num_workers=4, max_ahead=None):
+        """
+        :param issue_numbers: list of redmine issue numbers, in the order to import
+        :param render_func: function, called with an issue number.  Its return value is handed back
+        :param num_workers: int, number of rendering threads
+        :param max_ahead: int, max number of rendered payloads waiting to be imported.  Default is 4 x num_workers
+        """
+        if max_ahead is None:
+            max_ahead = max(num_workers, 1) * 4
+
+        self.issue_numbers = list(issue_numbers)
+        self.render_func = render_func
+        self.num_workers = num_workers
+        self.max_ahead = max_ahead
+
+        self.results = {}       # { position in issue_numbers : (issue number, payload, exc_info) }
+        self.results_ready = threading.Condition()
+        self.slots = threading.Semaphore(max_ahead)
+        self.stopped = False
+        self.feeder = None
+
+    def start(self):
+        self.feeder = threading.Thread(target=self.feed, name='payload-feeder')
+        self.feeder.daemon = True
+        self.feeder.start()
+        return self
+
+    def feed(self):
+        pool = WorkerPool(self.num_workers, name='payload-render').start()
+        for idx, issue_num in enumerate(self.issue_numbers):
+            self.slots.acquire()
+            if self.stopped:
+                break
+            pool.submit(self.render, idx, issue_num, label=issue_num)
+        pool.join()
+
+    def render(self, idx, issue_num):
+        payload, exc_info = None, None
+        try:
+            payload = self.render_func(issue_num)
+        except (Exception, SystemExit):
+            # SystemExit: msgx() calls.  Raised again in the caller's thread
+            exc_info = sys.exc_info()
+
+        with self.results_ready:
+            self.results[idx] = (issue_num, payload, exc_info)
+            self.results_ready.notify_all()
+
+    def __iter__(self):
+        try:
+            for idx in range(len(self.issue_numbers)):
+                with self.results_ready:
+                    while not idx in self.results:
+                        self.results_ready.wait(1)
+                    issue_num, payload, exc_info = self.results.pop(idx)
+                self.slots.release()
+
+                if exc_info is not None:
+                    msg(''.join(traceback.format_exception(*exc_info)))
+                    raise exc_info[1]
+                yield (issue_num, payload)
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop rendering, e.g. if the caller quits early"""
+        self.stopped = True
+        self.slots.release()    # unblock the feeder
@@ -0,0 +1,144 @@
+from __future__ import print_function
+import os
+import json
+import hashlib
+
+from utils.msg_util import *
+
+
+class RelationIndex:
+    """
+    Related and child tickets for every downloaded Redmine issue, read once from the JSON files.
+
+    Both sides of a "relates" (or other) relation are indexed: if issue 4062 lists
+    { "issue_id": 4062, "issue_to_id": 4160 }, then 4160 is related to 4062 and 4062 is related to 4160.
+    """
+
+    def __init__(self, issue_repository):
+        """
+        :param issue_repository: RedmineIssueRepository
+        """
+        self.issue_repository = issue_repository
+        self.related_lookup = {}     # { redmine issue # : set of related redmine issue #'s }
+        self.child_lookup = {}       # { redmine issue # : set of child redmine issue #'s }
+
+        self.load_index()
+
+    def add_edge(self, lookup, from_num, to_num):
+        if from_num == to_num:
+            return
+        lookup.setdefault(from_num, set()).add(to_num)
+
+    def load_index(self):
+        for issue_num, rd in self.issue_repository.iter_issues():
+
+            for rel in rd.get('relations', None) or []:
+                issue_id = rel.get('issue_id', None)
+                issue_to_id = rel.get('issue_to_id', None)
+                if issue_id is None or issue_to_id is None:
+                    continue
+                self.add_edge(self.related_lookup, issue_id, issue_to_id)
+                self.add_edge(self.related_lookup, issue_to_id, issue_id)      # reverse edge
+
+            for ctick in rd.get('children', None) or []:
+                child_id = ctick.get('id', None)
+                if child_id is not None:
+                    self.add_edge(self.child_lookup, issue_num, child_id)
+
+        msg('Relation index loaded: %s issues with related tickets, %s with child tickets' % (len(self.related_lookup), len(self.child_lookup)))
+
+    def get_related_ids(self, issue_num):
+        return sorted(self.related_lookup.get(issue_num, []))
+
+    def get_child_ids(self, issue_num):
+        return sorted(self.child_lookup.get(issue_num, []))
+
+    def get_linked_ticket_ids(self):
+        """
+        :returns: set of every issue # that is a related or child ticket of another issue
+        """
+        linked = set()
+        for lookup in [self.related_lookup, self.child_lookup]:
+            for ids in lookup.values():
+                linked.update(ids)
+        return linked
+
+    def get_linked_issue_numbers(self, start_number=0, end_number=None):
+        """
+        :returns: sorted list of issue #'s in the range that have related or child tickets
+        """
+        linked = set(self.related_lookup.keys()) | set(self.child_lookup.keys())
+        return sorted([x for x in linked if x >= start_number and (end_number is None or x <= end_number)])
+
+
+class RelatedUpdateState:
+    """
+    Remembers which github issues were updated with related tickets, with a hash of the
+    section that was added, so a rerun can skip the ones that haven't changed.
+    Also remembers the issues whose mentions were changed to the github numbers: rewriting
+    them a second time would change the github numbers again.
+
+    Append-only, one JSON line per update--the last hash for an issue wins:
+
+        {"redmine_issue_num": 4062, "section_hash": "9e107d9d372bb6826bd81d3542a419d6"}
+        {"redmine_issue_num": 4062, "mentions_rewritten": true}
+    """
+
+    def __init__(self, state_fname):
+        self.state_fname = state_fname
+        self.section_hashes = {}    # { redmine issue # (str) : md5 of the rendered related section }
+        self.mentions_rewritten = set()     # redmine issue #'s (str)
+        if os.path.isfile(state_fname):
+            self.load()
+
+    @staticmethod
+    def get_state_fname(redmine2github_map_file):
+        """
+        e.g. "redmine2github_issue_map.json" -> "redmine2github_issue_map.related_state.jsonl"
+        """
+        return os.path.splitext(redmine2github_map_file)[0] + '.related_state.jsonl'
+
+    @staticmethod
+    def get_section_hash(section):
+        if not isinstance(section, bytes):
+            section = section.encode('utf-8')
+        return hashlib.md5(section).hexdigest()
+
+    def load(self):
+        for line in open(self.state_fname, 'rU'):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue    # partially written line
+            if 'section_hash' in entry:
+                self.section_hashes[str(entry['redmine_issue_num'])] = entry['section_hash']
+            if entry.get('mentions_rewritten'):
+                self.mentions_rewritten.add(str(entry['redmine_issue_num']))
+
+    def is_unchanged(self, issue_num, section_hash):
+        return self.section_hashes.get(str(issue_num), None) == section_hash
+
+    def set_hash(self, issue_num, section_hash):
+        """
+        Remember the section added to an issue.  Written right away
+        """
+        self.section_hashes[str(issue_num)] = section_hash
+        self.append(dict(redmine_issue_num=int(issue_num), section_hash=section_hash))
+
+    def are_mentions_rewritten(self, issue_num):
+        return str(issue_num) in self.mentions_rewritten
+
+    def set_mentions_rewritten(self, issue_num):
+        """
+        Remember that the issue mentions were changed to the github numbers.  Written right away
+        """
+        self.mentions_rewritten.add(str(issue_num))
+        self.append(dict(redmine_issue_num=int(issue_num), mentions_rewritten=True))
+
+    def append(self, entry):
+        fh = open(self.state_fname, 'a')
+        fh.write(json.dumps(entry) + '\n')
+        fh.close()
@@ -0,0 +1,100 @@
+from __future__ import print_function
+import os
+import re
+import bisect
+
+from utils.msg_util import *
+
+
+class RedmineIssueCatalog:
+    """
+    In-memory list of the downloaded Redmine issue files, e.g. "00375.json", "01789.json"
+
+    The directory is read once.  Lookups by issue number, ranges and gaps
+    (issue numbers without a file) don't touch the file system again.
+
+    With an issue_store (RedmineIssueStore or IssuePack), the issue numbers come from it instead of the directory.
+    """
+
+    FNAME_PATTERN = re.compile(r'^(\d{1,10})\.json$')
+
+    def __init__(self, redmine_json_directory, issue_store=None):
+        self.redmine_json_directory = redmine_json_directory
+        self.issue_store = issue_store
+        self.issue_fnames = {}      # { issue number (int) : file name }
+        self.issue_numbers = []     # sorted issue numbers
+
+        self.load_catalog()
+
+    def load_catalog(self):
+        if self.issue_store is not None:
+            for issue_num in self.issue_store.get_issue_numbers():
+                self.issue_fnames[issue_num] = self.issue_store.get_issue_fname(issue_num)
+            self.issue_numbers = sorted(self.issue_fnames.keys())
+            msg('Issue catalog loaded: %s issues in %s' % (len(self.issue_numbers), self.issue_store.get_name()))
+            return
+
+        if not os.path.isdir(self.redmine_json_directory):
+            msgx('ERROR: Directory does not exist: %s' % self.redmine_json_directory)
+
+        for fname in os.listdir(self.redmine_json_directory):
+            m = self.FNAME_PATTERN.match(fname)
+            if m:
+                self.issue_fnames[int(m.group(1))] = fname
+
+        self.issue_numbers = sorted(self.issue_fnames.keys())
+        msg('Issue catalog loaded: %s issue files in %s' % (len(self.issue_numbers), self.redmine_json_directory))
+
+    def get_issue_count(self):
+        return len(self.issue_numbers)
+
+    def has_issue(self, issue_num):
+        return issue_num in self.issue_fnames
+
+    def get_fname(self, issue_num):
+        """
+        :returns: str, file name for the issue, e.g. "00375.json".  None if there isn't one
+        """
+        return self.issue_fnames.get(issue_num, None)
+
+    def get_fullpath(self, issue_num):
+        fname = self.get_fname(issue_num)
+        if fname is None:
+            return None
+        return os.path.join(self.redmine_json_directory, fname)
+
+    def get_fnames(self):
+        """
+        :returns: list of file names, sorted by issue number
+        """
+        return [self.issue_fnames[x] for x in self.issue_numbers]
+
+    def get_issue_numbers(self, start_number=0, end_number=None):
+        """
+        :param start_number: int, first issue number to include
+        :param end_number: int, last issue number to include.  None = go to the end
+        :returns: sorted list of the issue numbers with a file
+        """
+        start_idx = bisect.bisect_left(self.issue_numbers, start_number)
+        if end_number is None:
+            return self.issue_numbers[start_idx:]
+        end_idx = bisect.bisect_right(self.issue_numbers, end_number)
+        return self.issue_numbers[start_idx:end_idx]
+
+    def get_max_issue_number(self):
+        if not self.issue_numbers:
+            return None
+        return self.issue_numbers[-1]
+
+    def get_gaps(self, start_number=0, end_number=None):
+        """
+        :returns: sorted list of issue numbers in the range that do NOT have a file
+        """
+        if self.issue_store is not None:
+            return self.issue_store.get_gaps(start_number, end_number)
+
+        if end_number is None:
+            end_number = self.get_max_issue_number()
+        if end_number is None:
+            return []
+        return [x for x in range(start_number, end_number + 1) if not x in self.issue_fnames]
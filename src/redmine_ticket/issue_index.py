@@ -0,0 +1,90 @@
+from __future__ import print_function
+import os
+from os.path import join, isfile
+import json
+import hashlib
+import threading
+
+from utils.msg_util import *
+
+
+class IssueIndex:
+    """
+    Append-only index of the downloaded issues, in JSON Lines format.
+    One line is written per downloaded issue:
+
+        {"id": 4050, "subject": "Additional Astronomy...", "updated_on": "2014-07-09T14:22:31Z", "fname": "04050.json", "size": 5312, "md5": "..."}
+
+    The file may be read while a download is running (or after it crashed).
+    If an issue appears more than once, the last line wins.
+    """
+
+    INDEX_FNAME = 'issue_list.jsonl'
+
+    def __init__(self, issue_dirname):
+        self.issue_dirname = issue_dirname
+        self.index_fname = join(issue_dirname, self.INDEX_FNAME)
+        self.lock = threading.Lock()
+
+    def make_entry(self, issue_id, fname, content, subject=None, updated_on=None):
+        """
+        :param content: str, the issue file contents
+        :returns: dict for the index line
+        """
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        return dict(id=int(issue_id)\
+                    , subject=subject\
+                    , updated_on=updated_on\
+                    , fname=fname\
+                    , size=len(content)\
+                    , md5=hashlib.md5(content).hexdigest()\
+                    )
+
+    def append(self, entry):
+        """
+        Add a line to the index.  Thread safe.
+        """
+        line = json.dumps(entry) + '\n'
+        with self.lock:
+            fh = open(self.index_fname, 'a')
+            fh.write(line)
+            fh.close()
+
+    def load(self):
+        """
+        :returns: dict of { issue id (int) : entry dict }
+        """
+        entries = {}
+        if not isfile(self.index_fname):
+            return entries
+
+        for line in open(self.index_fname, 'rU'):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue    # partially written line, e.g. the download crashed
+            entries[entry['id']] = entry
+        return entries
+
+    def is_entry_valid(self, entry):
+        """
+        :returns: True if the issue file exists and matches the size/checksum in the index
+        """
+        fullpath = join(self.issue_dirname, entry.get('fname', ''))
+        if not isfile(fullpath):
+            return False
+        if not os.path.getsize(fullpath) == entry.get('size'):
+            return False
+        content = open(fullpath, 'rb').read()
+        return hashlib.md5(content).hexdigest() == entry.get('md5')
+
+    def get_issue_dict(self, pad_issue_id):
+        """
+        :param pad_issue_id: function to format an issue id.  e.g. 375 -> "00375"
+        :returns: { padded issue id : subject }, the "issue_list.json" format
+        """
+        return dict([(pad_issue_id(issue_id), entry.get('subject') or '') for issue_id, entry in self.load().items()])
@@ -0,0 +1,313 @@
+"""
+Issue pack: all the downloaded issues in 2 files, instead of a JSON file per issue.
+
+    issues.pack      - one gzip member per issue, each holding one line of JSON.
+                        The members are back to back, so "zcat issues.pack" gives JSON Lines
+    issues.pack.idx  - 8 byte header, then one fixed-width record per issue, sorted by issue id:
+                        (issue id, offset in the pack, compressed length)
+
+Readers mmap both files: an issue is found with a binary search of the index and
+only its own gzip member is decompressed.
+
+While the pack is written, the index records are also appended to "issues.pack.idx.log",
+so an interrupted download can add to the pack without reading it back.
+"""
+from __future__ import print_function
+import os
+import json
+import mmap
+import zlib
+import bisect
+import struct
+import threading
+
+from utils.msg_util import *
+from redmine_ticket.issue_catalog import RedmineIssueCatalog
+
+
+INDEX_HEADER = b'RMIX' + struct.pack('<I', 1)       # magic, version
+INDEX_RECORD = struct.Struct('<IQI')                # issue id, offset, length
+
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def get_index_fname(pack_fname):
+    return pack_fname + '.idx'
+
+
+def get_index_log_fname(pack_fname):
+    return pack_fname + '.idx.log'
+
+
+def compress_issue(rd):
+    """
+    :returns: bytes, the issue as a single gzip member with one JSON line
+    """
+    line = (json.dumps(rd) + '\n').encode('utf-8')
+    compressor = zlib.compressobj(6, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(line) + compressor.flush()
+
+
+def decompress_issue(data):
+    return json.loads(zlib.decompress(data, GZIP_WBITS).decode('utf-8'))
+
+
+def read_index_records(fname, header=b''):
+    """
+    :returns: list of (issue id, offset, length).  A partly written record at the end is ignored
+    """
+    if not os.path.isfile(fname):
+        return []
+    data = open(fname, 'rb').read()
+    if not data[:len(header)] == header:
+        msgx('ERROR: Not an issue pack index: %s' % fname)
+
+    records = []
+    for pos in range(len(header), len(data) - INDEX_RECORD.size + 1, INDEX_RECORD.size):
+        records.append(INDEX_RECORD.unpack_from(data, pos))
+    return records
+
+
+class IssuePackWriter:
+    """
+    Append issues to a pack.  The sorted index is written by close().
+
+    An existing pack is added to; a later copy of an issue replaces the earlier one in the index.
+    close() then compacts the pack: the copies that were replaced are dropped.
+    Thread safe.
+    """
+
+    def __init__(self, pack_fname):
+        self.pack_fname = pack_fname
+        self.lock = threading.Lock()
+        self.index_entries = {}     # { issue id : (offset, length) }
+
+        if os.path.isfile(pack_fname):
+            self.load_index_entries()
+
+        self.pack_file = open(pack_fname, 'ab')
+        self.index_log_file = open(get_index_log_fname(pack_fname), 'ab')
+
+    def load_index_entries(self):
+        """
+        Pick up the issues already in the pack: the sorted index, then the records logged after it
+        """
+        records = read_index_records(get_index_fname(self.pack_fname), INDEX_HEADER)\
+                    + read_index_records(get_index_log_fname(self.pack_fname))
+
+        pack_size = os.path.getsize(self.pack_fname)
+        for issue_id, offset, length in records:
+            if offset + length <= pack_size:
+                self.index_entries[issue_id] = (offset, length)
+
+        # drop an issue that was partly written
+        end_offset = max([offset + length for offset, length in self.index_entries.values()] or [0])
+        if end_offset < pack_size:
+            fh = open(self.pack_fname, 'r+b')
+            fh.truncate(end_offset)
+            fh.close()
+
+        # a log record may be partly written too
+        index_log_fname = get_index_log_fname(self.pack_fname)
+        if os.path.isfile(index_log_fname):
+            log_size = os.path.getsize(index_log_fname)
+            if log_size % INDEX_RECORD.size:
+                fh = open(index_log_fname, 'r+b')
+                fh.truncate(log_size - log_size % INDEX_RECORD.size)
+                fh.close()
+
+        msg('Issue pack opened: %s issues in %s' % (len(self.index_entries), self.pack_fname))
+
+    def has_issue(self, issue_id):
+        with self.lock:
+            return issue_id in self.index_entries
+
+    def has_current_issue(self, issue_id, updated_on):
+        """
+        :param updated_on: str, e.g. "2014-07-09T14:22:31Z", as listed by redmine
+        :returns: True if the pack has the issue as of updated_on--not an older copy
+        """
+        with self.lock:
+            entry = self.index_entries.get(issue_id, None)
+            if entry is None:
+                return False
+            offset, length = entry
+            fh = open(self.pack_fname, 'rb')
+            fh.seek(offset)
+            data = fh.read(length)
+            fh.close()
+        return decompress_issue(data).get('updated_on', None) == updated_on
+
+    def append(self, rd):
+        """
+        :param rd: dict, the redmine issue
+        """
+        data = compress_issue(rd)
+        with self.lock:
+            offset = self.pack_file.tell()
+            self.pack_file.write(data)
+            self.pack_file.flush()
+            self.index_log_file.write(INDEX_RECORD.pack(rd['id'], offset, len(data)))
+            self.index_log_file.flush()
+            self.index_entries[rd['id']] = (offset, len(data))
+
+    def get_superseded_size(self):
+        """
+        :returns: int, bytes in the pack taken by copies of issues that were replaced
+        """
+        return os.path.getsize(self.pack_fname) - sum([length for offset, length in self.index_entries.values()])
+
+    def write_compacted_pack(self, compacted_fname):
+        """
+        Copy the current member of each issue, in issue id order.  The index entries are
+        changed to the new offsets
+        """
+        src = open(self.pack_fname, 'rb')
+        dest = open(compacted_fname, 'wb')
+        compacted_entries = {}
+        for issue_id in sorted(self.index_entries.keys()):
+            offset, length = self.index_entries[issue_id]
+            src.seek(offset)
+            compacted_entries[issue_id] = (dest.tell(), length)
+            dest.write(src.read(length))
+        src.close()
+        dest.close()
+        self.index_entries = compacted_entries
+
+    def close(self):
+        with self.lock:
+            self.pack_file.close()
+            self.index_log_file.close()
+
+            superseded_size = self.get_superseded_size()
+            if superseded_size:
+                self.write_compacted_pack(self.pack_fname + '.tmp')
+
+            index_fname = get_index_fname(self.pack_fname)
+            fh = open(index_fname + '.tmp', 'wb')
+            fh.write(INDEX_HEADER)
+            for issue_id in sorted(self.index_entries.keys()):
+                offset, length = self.index_entries[issue_id]
+                fh.write(INDEX_RECORD.pack(issue_id, offset, length))
+            fh.close()
+
+            # the new pack and index are swapped in together
+            renames = [(index_fname + '.tmp', index_fname)]
+            if superseded_size:
+                renames.append((self.pack_fname + '.tmp', self.pack_fname))
+            for tmp_fname, fname in renames:
+                if os.path.isfile(fname):
+                    os.remove(fname)      # os.rename doesn't replace on windows
+                os.rename(tmp_fname, fname)
+            os.remove(get_index_log_fname(self.pack_fname))
+
+        if superseded_size:
+            msg('Issue pack compacted: %s bytes of replaced issues dropped' % superseded_size)
+
+        msg('Issue pack written: %s issues in %s' % (len(self.index_entries), self.pack_fname))
+
+
+class IssuePack:
+    """
+    Read issues from a pack.  Can be used in place of a RedmineIssueStore, e.g. by a
+    RedmineIssueCatalog or RedmineIssueRepository.  Thread safe.
+    """
+
+    def __init__(self, pack_fname, zero_padding_level=5):
+        """
+        :param pack_fname: str, the .pack file.  Its index must be next to it
+        :param zero_padding_level: int, for the issue file names.  See RedmineIssueDownloader.ZERO_PADDING_LEVEL
+        """
+        self.pack_fname = pack_fname
+        self.zero_padding_level = zero_padding_level
+
+        index_fname = get_index_fname(pack_fname)
+        if not os.path.isfile(index_fname):
+            msgx('ERROR: Issue pack index not found: %s' % index_fname)
+
+        self.index_map = self.mmap_file(index_fname)
+        if self.index_map is None or not self.index_map[:len(INDEX_HEADER)] == INDEX_HEADER:
+            msgx('ERROR: Not an issue pack index: %s' % index_fname)
+        self.record_count = (len(self.index_map) - len(INDEX_HEADER)) // INDEX_RECORD.size
+
+        self.pack_map = self.mmap_file(pack_fname)
+
+    def mmap_file(self, fname):
+        if os.path.getsize(fname) == 0:
+            return None
+        fh = open(fname, 'rb')
+        file_map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        fh.close()
+        return file_map
+
+    def get_name(self):
+        return self.pack_fname
+
+    def get_record(self, idx):
+        """
+        :returns: (issue id, offset, length) of the idx-th issue in the index
+        """
+        return INDEX_RECORD.unpack_from(self.index_map, len(INDEX_HEADER) + idx * INDEX_RECORD.size)
+
+    def find_record(self, issue_num):
+        lo, hi = 0, self.record_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = self.get_record(mid)
+            if record[0] < issue_num:
+                lo = mid + 1
+            elif record[0] > issue_num:
+                hi = mid
+            else:
+                return record
+        return None
+
+    def get_issue(self, issue_num):
+        """
+        :returns: dict, the redmine issue.  None if it isn't in the pack
+        """
+        record = self.find_record(issue_num)
+        if record is None:
+            return None
+        issue_id, offset, length = record
+        return decompress_issue(self.pack_map[offset:offset + length])
+
+    def get_issue_fname(self, issue_num):
+        """
+        :returns: str, the name the issue would have as a file, e.g. "00375.json"
+        """
+        return ('%s' % issue_num).zfill(self.zero_padding_level) + '.json'
+
+    def get_issue_by_fname(self, fname):
+        """
+        :param fname: str, e.g. "00375.json"
+        """
+        m = RedmineIssueCatalog.FNAME_PATTERN.match(fname)
+        if m is None:
+            return None
+        return self.get_issue(int(m.group(1)))
+
+    def has_issue(self, issue_num):
+        return self.find_record(issue_num) is not None
+
+    def get_issue_numbers(self, start_number=0, end_number=None):
+        """
+        :returns: sorted list of issue numbers in the pack
+        """
+        issue_numbers = [self.get_record(idx)[0] for idx in range(self.record_count)]
+        start_idx = bisect.bisect_left(issue_numbers, start_number)
+        if end_number is None:
+            return issue_numbers[start_idx:]
+        return issue_numbers[start_idx:bisect.bisect_right(issue_numbers, end_number)]
+
+    def get_issue_count(self):
+        return self.record_count
+
+    def get_gaps(self, start_number=0, end_number=None):
+        """
+        :returns: sorted list of issue numbers in the range that are NOT in the pack
+        """
+        issue_numbers = set(self.get_issue_numbers(start_number, end_number))
+        if end_number is None:
+            end_number = max(issue_numbers or [start_number - 1])
+        return [x for x in range(start_number, end_number + 1) if not x in issue_numbers]
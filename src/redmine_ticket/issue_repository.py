@@ -0,0 +1,134 @@
+from __future__ import print_function
+import os
+import json
+import threading
+from collections import OrderedDict
+
+from utils.msg_util import *
+from redmine_ticket.issue_catalog import RedmineIssueCatalog
+
+
+class RedmineIssueRepository:
+    """
+    Parsed Redmine issues from a directory of JSON files, e.g. "00375.json"
+
+    The migration reads the same file several times: to import it, to add the related tickets,
+    to update the redmine ticket, etc.  Each file is parsed once and kept in a bounded,
+    least-recently-used cache--along with values made from it, such as the github labels.
+
+    Issues are shared, not copied: don't change them.
+
+    With a RedmineIssueStore or IssuePack, the issues are read from it instead of the files.
+    """
+
+    DEFAULT_CACHE_SIZE = 2000
+
+    def __init__(self, redmine_json_directory, cache_size=DEFAULT_CACHE_SIZE, issue_store=None):
+        """
+        :param redmine_json_directory: str, directory with the redmine issue files
+        :param cache_size: int, max number of parsed issues kept in memory
+        :param issue_store: optional RedmineIssueStore or IssuePack.  If given, issues are read from it instead of the files
+        """
+        self.redmine_json_directory = redmine_json_directory
+        self.cache_size = cache_size
+        self.issue_store = issue_store
+        self.issue_catalog = None
+
+        # { file name : { 'issue' : parsed issue, 'derived' : { field name : value } } }, least recently used first
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def get_issue_catalog(self):
+        if self.issue_catalog is None:
+            self.issue_catalog = RedmineIssueCatalog(self.redmine_json_directory, issue_store=self.issue_store)
+        return self.issue_catalog
+
+    def get_cache_entry(self, fname):
+        with self.lock:
+            entry = self.cache.pop(fname, None)
+            if entry is not None:
+                self.cache[fname] = entry       # most recently used
+                self.hit_count += 1
+                return entry
+
+        if self.issue_store is not None:
+            rd = self.issue_store.get_issue_by_fname(fname)
+        else:
+            fullpath = os.path.join(self.redmine_json_directory, fname)
+            rd = None
+            if os.path.isfile(fullpath):
+                rd = json.loads(open(fullpath, 'rU').read())
+        if rd is None:
+            return None
+        entry = dict(issue=rd, derived={})
+
+        with self.lock:
+            self.miss_count += 1
+            self.cache[fname] = entry
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return entry
+
+    def get_issue_by_fname(self, fname):
+        """
+        :param fname: str, file name in the directory, e.g. "00375.json"
+        :returns: dict, the redmine issue.  None if the file doesn't exist
+        """
+        entry = self.get_cache_entry(fname)
+        if entry is None:
+            return None
+        return entry['issue']
+
+    def get_issue(self, issue_num):
+        """
+        :returns: dict, the redmine issue.  None if there isn't a file for the issue
+        """
+        fname = self.get_issue_catalog().get_fname(issue_num)
+        if fname is None:
+            return None
+        return self.get_issue_by_fname(fname)
+
+    def get_derived(self, fname, field_name, make_value):
+        """
+        Value made from an issue, e.g. its github labels.  Made once while the issue is in the cache
+
+        :param field_name: str, e.g. "labels"
+        :param make_value: function, called with the issue dict
+        """
+        entry = self.get_cache_entry(fname)
+        if entry is None:
+            return None
+
+        derived = entry['derived']
+        if not field_name in derived:
+            derived[field_name] = make_value(entry['issue'])
+        return derived[field_name]
+
+    def iter_issues(self, start_number=0, end_number=None):
+        """
+        :returns: generator of (issue number, issue dict), in issue number order
+        """
+        for issue_num in self.get_issue_catalog().get_issue_numbers(start_number, end_number):
+            yield (issue_num, self.get_issue(issue_num))
+
+    def show_stats(self):
+        msg('Issue cache: %s hits, %s files parsed, %s issues in memory' % (self.hit_count, self.miss_count, len(self.cache)))
+
+
+_repositories = {}      # { directory : RedmineIssueRepository }
+_repositories_lock = threading.Lock()
+
+
+def get_issue_repository(redmine_json_directory, issue_store=None):
+    """
+    Repository shared by every part of the migration that reads the directory
+
+    :param issue_store: optional RedmineIssueStore or IssuePack to read the issues from.  Only used when the repository is first made
+    """
+    key = os.path.abspath(redmine_json_directory)
+    with _repositories_lock:
+        if not key in _repositories:
+            _repositories[key] = RedmineIssueRepository(redmine_json_directory, issue_store=issue_store)
+        return _repositories[key]
@@ -0,0 +1,251 @@
+from __future__ import print_function
+import json
+import sqlite3
+import threading
+
+from utils.msg_util import *
+from redmine_ticket.issue_catalog import RedmineIssueCatalog
+
+
+class RedmineIssueStore:
+    """
+    Optional SQLite database of the downloaded Redmine issues: one file instead of a JSON file per issue.
+
+    Tables: issues, journals, relations, attachments.  The full issue JSON is kept in issues.content;
+    the other columns are there for indexed queries (status, tracker, fixed_version, updated_on, ...).
+
+    A RedmineIssueCatalog can be loaded from it: issue numbers and gaps are index queries
+    instead of directory listings.  File names, e.g. "00375.json", are still used to name the issues.
+
+    Writes are batched: queue_issue() adds to a buffer that's written in one transaction
+    every "batch_size" issues--and by flush().  Thread safe.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS issues (
+            id INTEGER PRIMARY KEY,
+            subject TEXT,
+            status_id INTEGER,
+            status_name TEXT,
+            tracker_id INTEGER,
+            tracker_name TEXT,
+            fixed_version_id INTEGER,
+            fixed_version_name TEXT,
+            created_on TEXT,
+            updated_on TEXT,
+            content TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS issues_status_idx ON issues (status_id);
+        CREATE INDEX IF NOT EXISTS issues_tracker_idx ON issues (tracker_id);
+        CREATE INDEX IF NOT EXISTS issues_fixed_version_idx ON issues (fixed_version_id);
+        CREATE INDEX IF NOT EXISTS issues_updated_on_idx ON issues (updated_on);
+
+        CREATE TABLE IF NOT EXISTS journals (
+            id INTEGER,
+            issue_id INTEGER NOT NULL,
+            user_name TEXT,
+            created_on TEXT,
+            notes TEXT
+        );
+        CREATE INDEX IF NOT EXISTS journals_issue_idx ON journals (issue_id);
+
+        CREATE TABLE IF NOT EXISTS relations (
+            id INTEGER,
+            issue_id INTEGER NOT NULL,
+            from_issue_id INTEGER,
+            to_issue_id INTEGER,
+            relation_type TEXT
+        );
+        CREATE INDEX IF NOT EXISTS relations_issue_idx ON relations (issue_id);
+        CREATE INDEX IF NOT EXISTS relations_to_issue_idx ON relations (to_issue_id);
+
+        CREATE TABLE IF NOT EXISTS attachments (
+            id INTEGER,
+            issue_id INTEGER NOT NULL,
+            filename TEXT,
+            filesize INTEGER,
+            content_url TEXT,
+            created_on TEXT
+        );
+        CREATE INDEX IF NOT EXISTS attachments_issue_idx ON attachments (issue_id);
+    """
+
+    CHILD_TABLES = ['journals', 'relations', 'attachments']
+
+    def __init__(self, db_fname, batch_size=100, zero_padding_level=5):
+        """
+        :param db_fname: str, the SQLite file.  Made if it doesn't exist
+        :param batch_size: int, number of queued issues written per transaction
+        :param zero_padding_level: int, for the issue file names.  See RedmineIssueDownloader.ZERO_PADDING_LEVEL
+        """
+        self.db_fname = db_fname
+        self.batch_size = batch_size
+        self.zero_padding_level = zero_padding_level
+
+        self.lock = threading.Lock()
+        self.pending_issues = []
+        self.conn = sqlite3.connect(db_fname, check_same_thread=False)
+        self.conn.executescript(self.SCHEMA)
+        self.conn.commit()
+
+    def get_name(self):
+        return self.db_fname
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.conn.close()
+
+    #
+    # Writing
+    #
+    def queue_issue(self, rd):
+        """
+        Add an issue to the next batch
+
+        :param rd: dict, the redmine issue
+        """
+        with self.lock:
+            self.pending_issues.append(rd)
+            if len(self.pending_issues) >= self.batch_size:
+                self.write_pending_issues()
+
+    def flush(self):
+        with self.lock:
+            self.write_pending_issues()
+
+    def write_pending_issues(self):
+        # call with self.lock held
+        if not self.pending_issues:
+            return
+
+        issue_rows = []
+        child_rows = dict([(x, []) for x in self.CHILD_TABLES])
+        for rd in self.pending_issues:
+            issue_id = rd['id']
+            status = rd.get('status', None) or {}
+            tracker = rd.get('tracker', None) or {}
+            fixed_version = rd.get('fixed_version', None) or {}
+            issue_rows.append((issue_id, rd.get('subject', None)\
+                            , status.get('id', None), status.get('name', None)\
+                            , tracker.get('id', None), tracker.get('name', None)\
+                            , fixed_version.get('id', None), fixed_version.get('name', None)\
+                            , rd.get('created_on', None), rd.get('updated_on', None)\
+                            , json.dumps(rd)))
+
+            for j in rd.get('journals', None) or []:
+                child_rows['journals'].append((j.get('id', None), issue_id\
+                            , (j.get('user', None) or {}).get('name', None)\
+                            , j.get('created_on', None), j.get('notes', None)))
+            for rel in rd.get('relations', None) or []:
+                child_rows['relations'].append((rel.get('id', None), issue_id\
+                            , rel.get('issue_id', None), rel.get('issue_to_id', None), rel.get('relation_type', None)))
+            for a in rd.get('attachments', None) or []:
+                child_rows['attachments'].append((a.get('id', None), issue_id\
+                            , a.get('filename', None), a.get('filesize', None)\
+                            , a.get('content_url', None), a.get('created_on', None)))
+
+        issue_ids = [(x[0],) for x in issue_rows]
+        with self.conn:     # one transaction
+            for table_name in self.CHILD_TABLES:
+                self.conn.executemany('DELETE FROM %s WHERE issue_id = ?' % table_name, issue_ids)
+            self.conn.executemany('INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', issue_rows)
+            self.conn.executemany('INSERT INTO journals VALUES (?, ?, ?, ?, ?)', child_rows['journals'])
+            self.conn.executemany('INSERT INTO relations VALUES (?, ?, ?, ?, ?)', child_rows['relations'])
+            self.conn.executemany('INSERT INTO attachments VALUES (?, ?, ?, ?, ?, ?)', child_rows['attachments'])
+
+        self.pending_issues = []
+
+    #
+    # Reading
+    #
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def get_issue(self, issue_num):
+        """
+        :returns: dict, the redmine issue.  None if it isn't in the store
+        """
+        rows = self.query('SELECT content FROM issues WHERE id = ?', (issue_num,))
+        if not rows:
+            return None
+        return json.loads(rows[0][0])
+
+    def get_issue_fname(self, issue_num):
+        """
+        :returns: str, the name the issue would have as a file, e.g. "00375.json"
+        """
+        return ('%s' % issue_num).zfill(self.zero_padding_level) + '.json'
+
+    def get_issue_by_fname(self, fname):
+        """
+        :param fname: str, e.g. "00375.json"
+        """
+        m = RedmineIssueCatalog.FNAME_PATTERN.match(fname)
+        if m is None:
+            return None
+        return self.get_issue(int(m.group(1)))
+
+    def get_issue_numbers(self, start_number=0, end_number=None, **filters):
+        """
+        :param filters: optional column values, e.g. status_id=1, tracker_id=2, fixed_version_id=96
+        :returns: sorted list of issue numbers in the store
+        """
+        where = ['id >= ?']
+        params = [start_number]
+        if end_number is not None:
+            where.append('id <= ?')
+            params.append(end_number)
+        for column_name in ['status_id', 'tracker_id', 'fixed_version_id']:
+            if column_name in filters:
+                where.append('%s = ?' % column_name)
+                params.append(filters[column_name])
+        if 'updated_since' in filters:
+            where.append('updated_on >= ?')
+            params.append(filters['updated_since'])
+
+        rows = self.query('SELECT id FROM issues WHERE %s ORDER BY id' % ' AND '.join(where), params)
+        return [x[0] for x in rows]
+
+    def get_issue_count(self):
+        return self.query('SELECT COUNT(*) FROM issues')[0][0]
+
+    def get_max_issue_number(self):
+        return self.query('SELECT MAX(id) FROM issues')[0][0]
+
+    def has_issue(self, issue_num):
+        return len(self.query('SELECT 1 FROM issues WHERE id = ?', (issue_num,))) > 0
+
+    def has_current_issue(self, issue_num, updated_on):
+        """
+        :param updated_on: str, e.g. "2014-07-09T14:22:31Z", as listed by redmine
+        :returns: True if the store has the issue as of updated_on--not an older copy
+        """
+        rows = self.query('SELECT updated_on FROM issues WHERE id = ?', (issue_num,))
+        return len(rows) > 0 and rows[0][0] == updated_on
+
+    def get_gaps(self, start_number=0, end_number=None):
+        """
+        :returns: sorted list of issue numbers in the range that are NOT in the store
+        """
+        if end_number is None:
+            end_number = self.get_max_issue_number()
+        if end_number is None or end_number < start_number:
+            return []
+
+        # each issue followed by a missing number starts a gap, which ends before the next issue
+        rows = self.query("""SELECT a.id + 1, (SELECT MIN(b.id) FROM issues b WHERE b.id > a.id)
+                            FROM issues a
+                            WHERE a.id >= ? AND a.id < ?
+                              AND NOT EXISTS (SELECT 1 FROM issues c WHERE c.id = a.id + 1)""", (start_number, end_number))
+        gaps = []
+        first_issue = self.query('SELECT MIN(id) FROM issues WHERE id >= ?', (start_number,))[0][0]
+        if first_issue is None:
+            first_issue = end_number + 1
+        gaps += range(start_number, min(first_issue, end_number + 1))
+        for gap_start, next_issue in rows:
+            if next_issue is None:
+                next_issue = end_number + 1
+            gaps += range(gap_start, min(next_issue, end_number + 1))
+        return sorted(gaps)
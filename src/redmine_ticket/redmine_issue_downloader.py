@@ -1,9 +1,11 @@
 from __future__ import print_function
 import os
-from os.path import dirname, join, abspath, isdir
+from os.path import dirname, join, abspath, isdir, isfile
 import sys
+import shutil
 import json
-import requests
+import time
+import threading
 try:
     from urlparse import urljoin
 except:
@@ -18,6 +20,12 @@ if __name__=='__main__':
 
 from datetime import datetime
 from utils.msg_util import *
+from utils.worker_pool import WorkerPool
+from utils.http_session import get_http_session
+from redmine_ticket.issue_index import IssueIndex
+from redmine_ticket.issue_repository import get_issue_repository
+from redmine_ticket.issue_store import RedmineIssueStore
+from redmine_ticket.issue_pack import IssuePackWriter
 
 class RedmineIssueDownloader:
     """
@@ -38,6 +46,14 @@ class RedmineIssueDownloader:
     #
     ZERO_PADDING_LEVEL = 5
 
+    # Written to the issues_base_directory after each download.  Used by the "incremental" mode
+    #   { "updated_on" : (latest redmine "updated_on" seen), "issue_dirname" : (directory of that download) }
+    DOWNLOAD_STATE_FNAME = 'download_state.json'
+
+    # Written to the download directory after each page of issues.  Used to resume an interrupted download
+    #   { "last_completed_id" : (all listed issues up to this id are saved), "filter_kwargs" : {...}, "completed" : false }
+    CHECKPOINT_FNAME = 'download_checkpoint.json'
+
     def __init__(self, redmine_server, redmine_api_key, project_name_or_identifier, issues_base_directory, **kwargs):
         """
         Constructor
@@ -47,6 +63,11 @@ class RedmineIssueDownloader:
         :param project_name_or_identifier: str or int with either the redmine project id or project identifier
         :param issues_base_directory: str, directory to download the redmine issues in JSON format.  Directory will be crated
         :param specific_tickets_to_download: optional, list of specific ticket numbers to download. e.g. [2215, 2216, etc]
+        :param num_workers: optional, int.  Number of issues fetched from redmine in parallel.  Default is 4
+        :param incremental: optional, boolean.  Only download issues updated since the last run.  Unchanged issues are linked/copied from the last download directory.  Default is False
+        :param resume: optional, boolean.  Continue an interrupted download in the same directory, using its checkpoint file.  Default is True
+        :param issue_store_fname: optional, str.  SQLite file the issues are also written to (see RedmineIssueStore).  Default is None
+        :param issue_pack_fname: optional, str.  Pack file the issues are also written to (see issue_pack.py).  Default is None
         """
         self.redmine_server = redmine_server
         self.redmine_api_key = redmine_api_key
@@ -56,6 +77,18 @@ class RedmineIssueDownloader:
 
         self.specific_tickets_to_download = kwargs.get('specific_tickets_to_download', None)
 
+        # Issue details are retrieved by a pool of threads while the paging loop keeps listing ids
+        self.num_workers = kwargs.get('num_workers', 4)
+
+        # Only retrieve issues changed since the last download.  Note: issues deleted in redmine are not detected
+        self.incremental = kwargs.get('incremental', False)
+
+        # Pick up where an interrupted download (same directory) stopped
+        self.resume = kwargs.get('resume', True)
+        self.checkpoint_lock = threading.Lock()
+        self.pending_ids = set()    # queued for download, not yet finished
+        self.failed_ids = set()
+
         self.redmine_conn = None
         self.redmine_project = None
 
@@ -63,6 +96,20 @@ class RedmineIssueDownloader:
                                 ,  datetime.today().strftime(RedmineIssueDownloader.TIME_FORMAT_STRING)\
                                 )
 
+        self.issue_index = IssueIndex(self.issue_dirname)
+
+        # Optional SQLite copy of the issues, written in batches.  Keep the same file across
+        # incremental downloads: issues that haven't changed are already in it
+        self.issue_store = None
+        issue_store_fname = kwargs.get('issue_store_fname', None)
+        if issue_store_fname:
+            self.issue_store = RedmineIssueStore(issue_store_fname, zero_padding_level=self.ZERO_PADDING_LEVEL)
+
+        # Optional pack file: every issue in one compressed file plus an index, e.g. to rsync.
+        # Opened for each download.  Like the store, keep the same file across incremental downloads
+        self.issue_pack_fname = kwargs.get('issue_pack_fname', None)
+        self.issue_pack = None
+
         self.setup()
 
     def setup(self):
@@ -77,11 +124,13 @@ class RedmineIssueDownloader:
         msg('Connected to server [%s] project [%s]' % (self.redmine_server, self.project_name_or_identifier))
 
 
-    def get_issue_count(self):
+    def get_issue_count(self, **filter_kwargs):
         msgt('get_issue_count')
 
         issue_query_str = 'issues.json?project_id=%s&limit=1&status_id=%s' \
                             % (self.project_name_or_identifier, self.issue_status)
+        for k, v in filter_kwargs.items():
+            issue_query_str += '&%s=%s' % (k, v)
 
         url = urljoin(self.redmine_server, issue_query_str)
 
@@ -91,7 +140,7 @@ class RedmineIssueDownloader:
         #   from: http://www.redmine.org/projects/redmine/wiki/Rest_api
         #
         auth = (self.redmine_api_key, 'random-pw')
-        r = requests.get(url, auth=auth)
+        r = self.get_http_session().get(url, auth=auth)
         if not r.status_code == 200:
             msgt('Error!')
             msg(r.text)
@@ -154,57 +203,464 @@ print (data['total_count'])
         msg(self.redmine_project._attributes)
 
 
+    def get_http_session(self):
+        """Pooled session, with a connection for each download worker"""
+        return get_http_session(self.num_workers)
+
+    def get_redmine_api_json(self, path, params):
+        """
+        GET a redmine REST url, e.g. "issues.json", and return the JSON response as a dict
+        """
+        url = urljoin(self.redmine_server, path)
+
+        # Note: Auth purposely uses the API KEY "as a username with a random password via HTTP Basic authentication"
+        #   from: http://www.redmine.org/projects/redmine/wiki/Rest_api
+        #
+        auth = (self.redmine_api_key, 'random-pw')
+        r = self.get_http_session().get(url, params=params, auth=auth)
+        if not r.status_code == 200:
+            msgt('Error!')
+            msg(r.text)
+            raise Exception("Request failed! Status code: %s\nUrl: %s\nParams: %s" % (r.status_code, url, params))
+
+        return r.json()
+
+    def get_issue_pages(self, page_size=100, start_after_id=0, **filter_kwargs):
+        """
+        Generator.  List the project issues in pages, ordered by id.
+
+        Keyset paging: each page asks for issues with an id greater than the last id seen,
+        rather than using an offset.  Issues created or closed mid-run don't shift the pages,
+        so each issue is visited exactly once.
+
+        If the server ignores the "issue_id" filter (e.g. an older redmine), the listing
+        switches to offset paging.  See get_issue_pages_by_offset()
+
+        :param page_size: int, number of issues per request
+        :param start_after_id: int, only list issues with an id greater than this one
+        :param filter_kwargs: additional redmine filter params.  e.g. { 'updated_on' : '>=2014-07-09T14:22:31Z' }
+        :returns: yields lists of issue dicts, as listed by the redmine api (no journals, relations, etc)
+        """
+        last_id = start_after_id
+        seen_ids = set()
+        while True:
+            params = dict(project_id=self.project_name_or_identifier\
+                        , status_id=self.issue_status\
+                        , sort='id'\
+                        , limit=page_size\
+                        , issue_id='>=%d' % (last_id + 1)\
+                        )
+            params.update(filter_kwargs)
+
+            msgt('Retrieve issues with id > %s' % last_id)
+            data = self.get_redmine_api_json('issues.json', params)
+
+            # Sort and drop anything already seen, in case the server ignored the filter or sort
+            page = [x for x in data.get('issues', []) if x.get('id', 0) > last_id]
+            page.sort(key=lambda x: x['id'])
+            if len(page) == 0:
+                if data.get('issues', []):
+                    # a full listing again: the filter was ignored
+                    msgt('Warning: redmine ignored the "issue_id" filter.  Listing issues by offset instead')
+                    for page in self.get_issue_pages_by_offset(page_size, start_after_id, seen_ids, **filter_kwargs):
+                        yield page
+                return
+
+            seen_ids.update([x['id'] for x in page])
+            yield page
+
+            last_id = page[-1]['id']
+
+            # A short page is the last one.  (redmine reports the limit it actually applied)
+            if len(data.get('issues', [])) < data.get('limit', page_size):
+                return
+
+    def get_issue_pages_by_offset(self, page_size=100, start_after_id=0, seen_ids=None, **filter_kwargs):
+        """
+        Generator.  List the project issues in pages, using an offset.  Used if the server ignores the
+        "issue_id" filter.  Issues already listed (seen_ids) are skipped, so none is visited twice--but an
+        issue can be missed if issues are deleted mid-run.
+
+        :param seen_ids: optional set of int, issue ids already listed.  Ids listed here are added to it
+        :returns: yields lists of issue dicts, sorted by id
+        """
+        if seen_ids is None:
+            seen_ids = set()
+
+        offset = 0
+        while True:
+            params = dict(project_id=self.project_name_or_identifier\
+                        , status_id=self.issue_status\
+                        , sort='id'\
+                        , limit=page_size\
+                        , offset=offset\
+                        )
+            params.update(filter_kwargs)
+
+            msgt('Retrieve issues from offset %s' % offset)
+            data = self.get_redmine_api_json('issues.json', params)
+            issues = data.get('issues', [])
+
+            page = [x for x in issues if x.get('id', 0) > start_after_id and not x.get('id') in seen_ids]
+            page.sort(key=lambda x: x['id'])
+            seen_ids.update([x['id'] for x in page])
+            if page:
+                yield page
+
+            offset += len(issues)
+            if len(issues) < data.get('limit', page_size) or offset >= data.get('total_count', offset):
+                return
+
+    def get_specific_issue_pages(self, issue_ids, page_size=100):
+        """
+        Generator.  List specific issues by id, in batches, using the "issue_id" filter.
+        The number of requests depends on the number of ids--not on the size of the project.
+
+        :param issue_ids: list of int, redmine issue ids.  e.g. [2215, 2216, etc]
+        :param page_size: int, number of issue ids per request
+        :returns: yields lists of issue dicts, as listed by the redmine api
+        """
+        issue_ids = sorted(set([int(x) for x in issue_ids]))
+        for idx in range(0, len(issue_ids), page_size):
+            id_batch = issue_ids[idx:idx+page_size]
+            params = dict(project_id=self.project_name_or_identifier\
+                        , status_id=self.issue_status\
+                        , sort='id'\
+                        , limit=page_size\
+                        , issue_id=','.join([str(x) for x in id_batch])\
+                        )
+            msgt('Retrieve specific issues: %s - %s' % (id_batch[0], id_batch[-1]))
+            data = self.get_redmine_api_json('issues.json', params)
+
+            batch_lookup = set(id_batch)
+            page = [x for x in data.get('issues', []) if x.get('id') in batch_lookup]
+            page.sort(key=lambda x: x['id'])
+            if page:
+                yield page
+
     def download_tickets2(self):
         """
-        fyi: Retrieving total count via regular api, not python redmine package
+        Download the project issues.  Issues are listed via the regular api (not the python redmine package),
+        and the issue details are retrieved in parallel.
+
+        Each downloaded issue is appended to the index, "issue_list.jsonl".  At the end of the run,
+        the index is compacted into "issue_list.json"
         """
-        issue_dict = {}
         issue_fname = join(self.issue_dirname, 'issue_list.json')
         msg('Gathering issue information.... (may take a minute)')
 
-        ticket_cnt = self.get_issue_count()
+        download_state = self.get_download_state()
+        checkpoint = self.get_checkpoint()
+        latest_updated_on = None
+        start_after_id = 0
+
+        if self.specific_tickets_to_download is not None:
+            # only download specific tickets
+            #
+            filter_kwargs = {}
+            issue_pages = self.get_specific_issue_pages(self.specific_tickets_to_download)
+            checkpoint = None
+        elif checkpoint:
+            # resume an interrupted download
+            #
+            filter_kwargs = checkpoint.get('filter_kwargs', {})
+            start_after_id = checkpoint.get('last_completed_id', 0)
+            latest_updated_on = checkpoint.get('latest_updated_on', None)
+            msgt('Resuming download after issue %s (checkpoint: %s)' % (start_after_id, self.get_checkpoint_fname()))
+            issue_pages = self.get_issue_pages(start_after_id=start_after_id, **filter_kwargs)
+        else:
+            filter_kwargs = self.get_incremental_filter(download_state)
+            issue_pages = self.get_issue_pages(**filter_kwargs)
+
+        # Issues already saved in this directory.  Skipped when resuming
+        saved_entries = {}
+        if checkpoint:
+            saved_entries = self.issue_index.load()
+
+        if self.issue_pack_fname:
+            self.issue_pack = IssuePackWriter(self.issue_pack_fname)
+
+        pool = WorkerPool(self.num_workers, name='issue-download').start()
+        download_start = time.time()
+
+        listed_ids = set()
+        last_listed_id = start_after_id
+        skip_cnt = 0
 
-        RECORD_RETRIEVAL_SIZE = 100
+        cnt = 0
+        for page in issue_pages:
+            for item in page:
+                updated_on = item.get('updated_on', None)
+                if updated_on and (latest_updated_on is None or updated_on > latest_updated_on):
+                    latest_updated_on = updated_on
+
+                listed_ids.add(item['id'])
+                if checkpoint and self.is_issue_already_saved(item, saved_entries):
+                    skip_cnt += 1
+                    fullpath = join(self.issue_dirname, self.get_issue_fname(item['id']))
+                    if self.issue_store is not None and not self.issue_store.has_current_issue(item['id'], updated_on):
+                        # saved before the interruption, but its batch wasn't written.
+                        # (The store may have an older copy, from an earlier download)
+                        self.issue_store.queue_issue(json.loads(open(fullpath, 'rU').read()))
+                    if self.issue_pack is not None and not self.issue_pack.has_current_issue(item['id'], updated_on):
+                        self.issue_pack.append(json.loads(open(fullpath, 'rU').read()))
+                    continue
 
-        num_loops = ticket_cnt / RECORD_RETRIEVAL_SIZE
-        extra_recs = ticket_cnt % RECORD_RETRIEVAL_SIZE
-        if extra_recs > 0:
-            num_loops+=1
-        #num_loops=3
-        msg('num_loops: %d' % num_loops)
-        msg('extra_recs: %d' % extra_recs)
+                cnt +=1
+                with self.checkpoint_lock:
+                    self.pending_ids.add(item['id'])
+                pool.submit(self.download_issue, item, label=item['id'])
+
+            last_listed_id = page[-1]['id']
+            if self.specific_tickets_to_download is None:
+                self.write_checkpoint(last_listed_id, filter_kwargs, latest_updated_on)
+
+        if self.specific_tickets_to_download is not None:
+            not_found = set([int(x) for x in self.specific_tickets_to_download]) - listed_ids
+            if not_found:
+                msgt('Specific tickets not found in project [%s]: %s' % (self.project_name_or_identifier, sorted(not_found)))
+
+        # wait for the queued issue downloads
+        pool.join()
+        if self.issue_store is not None:
+            self.issue_store.flush()
+        if self.issue_pack is not None:
+            self.issue_pack.close()
+            self.issue_pack = None
+
+        if filter_kwargs:
+            self.copy_unchanged_issues(download_state, listed_ids)
+
+        # Compact the index.  Issues that failed to download are not in it
+        self.write_issue_list(issue_fname, self.issue_index.get_issue_dict(self.pad_issue_id))
+
+        if skip_cnt:
+            msg('Issues already saved, skipped: %s' % skip_cnt)
+        self.show_download_stats(pool, cnt, time.time() - download_start)
+
+        if self.specific_tickets_to_download is None:
+            # If anything failed, the checkpoint stays open--rerun to retry the failed issues
+            self.write_checkpoint(last_listed_id, filter_kwargs, latest_updated_on, completed=not pool.errors)
+
+        # If anything failed, keep the old mark so the failed issues are retried on the next run
+        if pool.errors or latest_updated_on is None:
+            latest_updated_on = download_state.get('updated_on', latest_updated_on)
+        if self.specific_tickets_to_download is None:
+            self.write_download_state(latest_updated_on)
+
+    def download_issue(self, listed_issue):
+        """
+        Retrieve and save a single issue, then add it to the index
 
-        cnt = 0
-        for loop_num in range(0, int(num_loops)):
-            start_record = loop_num * RECORD_RETRIEVAL_SIZE
-            end_record = (loop_num+1) * RECORD_RETRIEVAL_SIZE
+        :param listed_issue: issue dict, as listed by the redmine api
+        """
+        issue_id = listed_issue['id']
+        try:
+            json_str = self.save_single_issue(issue_id)
+            if self.issue_store is not None or self.issue_pack is not None:
+                rd = json.loads(json_str)
+                if self.issue_store is not None:
+                    self.issue_store.queue_issue(rd)
+                if self.issue_pack is not None and not self.issue_pack.has_current_issue(issue_id, rd.get('updated_on', None)):
+                    self.issue_pack.append(rd)      # not if the pack already has this copy
+
+            entry = self.issue_index.make_entry(issue_id\
+                                    , self.get_issue_fname(issue_id)\
+                                    , json_str\
+                                    , subject=listed_issue.get('subject', '')\
+                                    , updated_on=listed_issue.get('updated_on', None))
+            self.issue_index.append(entry)
+        except:
+            with self.checkpoint_lock:
+                self.failed_ids.add(issue_id)
+            raise
+        finally:
+            with self.checkpoint_lock:
+                self.pending_ids.discard(issue_id)
+
+    def is_issue_already_saved(self, listed_issue, saved_entries):
+        """
+        Resuming a download: is there already a good file for this issue?
+        No network call is made.
+
+        :param listed_issue: issue dict, as listed by the redmine api
+        :param saved_entries: dict from IssueIndex.load()
+        """
+        issue_id = listed_issue['id']
+        entry = saved_entries.get(issue_id, None)
+        if entry is not None:
+            if entry.get('updated_on') == listed_issue.get('updated_on') and self.issue_index.is_entry_valid(entry):
+                return True
+            return False
+
+        # The file may have been written before the index line, e.g. a crash in between
+        fname = self.get_issue_fname(issue_id)
+        fullpath = join(self.issue_dirname, fname)
+        if not isfile(fullpath):
+            return False
+        content = open(fullpath, 'rU').read()
+        try:
+            issue_dict = json.loads(content)
+        except ValueError:
+            return False
+        if not issue_dict.get('updated_on') == listed_issue.get('updated_on'):
+            return False
 
-            msgt('Retrieve records via idx (skip last): %s - %s' % (start_record, end_record))
+        self.issue_index.append(self.issue_index.make_entry(issue_id, fname, content\
+                                        , subject=listed_issue.get('subject', '')\
+                                        , updated_on=listed_issue.get('updated_on', None)))
+        return True
 
-            # limit of 100 is returning 125
-            rec_cnt = 0
-            for item in self.redmine_conn.issue.filter(project_id=self.project_name_or_identifier, status_id=self.issue_status, sort='id', offset=start_record)[:RECORD_RETRIEVAL_SIZE]: #, limit=RECORD_RETRIEVAL_SIZE):   #[start_record:end_record]
-                rec_cnt +=1
-                cnt +=1
-                #msg('(%s) %s - %s' % (rec_cnt, item.id, item.subject))
-
-                if self.specific_tickets_to_download is not None:
-                    # only download specific tickets
-                    #
-                    if item.id in self.specific_tickets_to_download:
-                        self.save_single_issue(item)
-                        issue_dict[self.pad_issue_id(item.id)] = item.subject
-                    continue    # go to next item
-                else:
-                    # Get all tickets
-                    #
-                    self.save_single_issue(item)
-                    issue_dict[self.pad_issue_id(item.id)] = item.subject
-                if rec_cnt == RECORD_RETRIEVAL_SIZE:
-                    break
-                #continue
-                #self.save_single_issue(item)
-            self.write_issue_list(issue_fname, issue_dict)
+    def get_checkpoint_fname(self):
+        return join(self.issue_dirname, self.CHECKPOINT_FNAME)
+
+    def get_checkpoint(self):
+        """
+        :returns: checkpoint dict of an interrupted download in this directory, or None
+        """
+        if not self.resume:
+            return None
+
+        checkpoint_fname = self.get_checkpoint_fname()
+        if not isfile(checkpoint_fname):
+            return None
+
+        try:
+            checkpoint = json.loads(open(checkpoint_fname, 'rU').read())
+        except ValueError:
+            msg('Checkpoint file not readable, starting over: %s' % checkpoint_fname)
+            return None
+
+        if checkpoint.get('completed', False):
+            return None
+        return checkpoint
+
+    def write_checkpoint(self, last_listed_id, filter_kwargs, latest_updated_on, completed=False):
+        """
+        Record how far the download got.  "last_completed_id" only moves past an issue
+        once it--and every listed issue before it--has been saved.
+        """
+        with self.checkpoint_lock:
+            unfinished_ids = self.pending_ids | self.failed_ids
+            if unfinished_ids:
+                last_completed_id = min(unfinished_ids) - 1
+            else:
+                last_completed_id = last_listed_id
+
+        checkpoint = dict(last_completed_id=last_completed_id\
+                        , filter_kwargs=filter_kwargs\
+                        , latest_updated_on=latest_updated_on\
+                        , completed=completed\
+                        )
+
+        # write to a temp file first, so a crash doesn't leave a half-written checkpoint
+        checkpoint_fname = self.get_checkpoint_fname()
+        tmp_fname = checkpoint_fname + '.tmp'
+        fh = open(tmp_fname, 'w')
+        fh.write(json.dumps(checkpoint, indent=4))
+        fh.close()
+        try:
+            os.rename(tmp_fname, checkpoint_fname)
+        except OSError:
+            os.remove(checkpoint_fname)     # windows won't rename over an existing file
+            os.rename(tmp_fname, checkpoint_fname)
+
+
+    def get_download_state_fname(self):
+        return join(self.issues_base_directory, self.DOWNLOAD_STATE_FNAME)
+
+    def get_download_state(self):
+        """
+        :returns: dict with the "updated_on" mark and "issue_dirname" of the last download.  Empty dict if there isn't one
+        """
+        state_fname = self.get_download_state_fname()
+        if not isfile(state_fname):
+            return {}
+        return json.loads(open(state_fname, 'rU').read())
+
+    def write_download_state(self, latest_updated_on):
+        if latest_updated_on is None:
+            return
+        state = dict(updated_on=latest_updated_on, issue_dirname=self.issue_dirname)
+        fh = open(self.get_download_state_fname(), 'w')
+        fh.write(json.dumps(state, indent=4))
+        fh.close()
+        msg('download state updated: %s' % state)
+
+    def get_incremental_filter(self, download_state):
+        """
+        :returns: dict of extra redmine filter params.  e.g. { 'updated_on' : '>=2014-07-09T14:22:31Z' }
+        """
+        if not self.incremental:
+            return {}
+
+        if not download_state.get('updated_on') or not isdir(download_state.get('issue_dirname', '')):
+            msgt('Incremental download: no previous download found.  Retrieving all issues')
+            return {}
+
+        msgt('Incremental download: issues updated on or after %s' % download_state['updated_on'])
+        return dict(updated_on='>=%s' % download_state['updated_on'])
+
+    def copy_unchanged_issues(self, download_state, updated_ids):
+        """
+        Incremental download: bring over issue files from the previous download directory
+        that were not re-downloaded in this run.  Files are hard linked when possible.
+        (If the previous download used the same directory, only the index is updated)
+
+        :param download_state: dict from get_download_state()
+        :param updated_ids: set of int, issue ids retrieved in this run
+        """
+        prev_dirname = download_state['issue_dirname']
+
+        prev_entries = IssueIndex(prev_dirname).load()
+        prev_issue_dict = {}
+        prev_issue_fname = join(prev_dirname, 'issue_list.json')
+        if not prev_entries and isfile(prev_issue_fname):
+            # download made before the index existed
+            prev_issue_dict = json.loads(open(prev_issue_fname, 'rU').read())
+
+        current_entries = self.issue_index.load()
+
+        copy_cnt = 0
+        for fname in os.listdir(prev_dirname):
+            padded_id = fname.replace('.json', '')
+            if not fname.endswith('.json') or not padded_id.isdigit():
+                continue
+            issue_id = int(padded_id)
+            if issue_id in updated_ids:
+                continue    # updated in this run
+            src = join(prev_dirname, fname)
+            dest = join(self.issue_dirname, fname)
+            if not isfile(dest):
+                try:
+                    os.link(src, dest)
+                except (OSError, AttributeError):
+                    shutil.copy2(src, dest)
+
+            if issue_id not in current_entries:
+                entry = prev_entries.get(issue_id, None)
+                if entry is None:
+                    entry = self.issue_index.make_entry(issue_id, fname, open(dest, 'rb').read()\
+                                            , subject=prev_issue_dict.get(padded_id, ''))
+                self.issue_index.append(entry)
+            copy_cnt += 1
+
+        msg('Unchanged issues copied from %s: %s' % (prev_dirname, copy_cnt))
+
+
+    def show_download_stats(self, pool, issue_cnt, elapsed_seconds):
+        """
+        Report failed downloads and the issues/sec throughput
+        """
+        msgt('Download complete')
+        if pool.errors:
+            msg('Failed to download %s issue(s):' % len(pool.errors))
+            for issue_id, err_msg, err_trace in pool.errors:
+                msg('  issue %s: %s' % (issue_id, err_msg))
+        msg('Issues downloaded: %s of %s' % (pool.completed_count, issue_cnt))
+        msg('Elapsed seconds: %.1f' % elapsed_seconds)
+        if elapsed_seconds > 0:
+            msg('Throughput: %.2f issues/sec (%s workers)' % (pool.completed_count / float(elapsed_seconds), self.num_workers))
 
 
     def pad_issue_id(self, issue_id):
@@ -213,23 +669,26 @@ print (data['total_count'])
 
         return ('%s' % issue_id).zfill(self.ZERO_PADDING_LEVEL)
 
-    def save_single_issue(self, single_issue):
+    def get_issue_fname(self, issue_id):
+        return self.pad_issue_id(issue_id) + '.json'
+
+    def save_single_issue(self, issue_id):
         """
-        Write a single issue object to a file using JSON format
+        Retrieve a single issue and write it to a file using JSON format
 
-        :param single_issue: Issue object
+        :param issue_id: int, redmine issue id
+        :returns: json string with issue information
         """
-        if single_issue is None:
-            msgx('ERROR. download_single_issue. The "single_issue" is None')
+        if issue_id is None:
+            msgx('ERROR. download_single_issue. The "issue_id" is None')
 
         ## FIX: Expensive adjustment -- to pull out full relation and journal info
-        json_str = self.get_single_issue(single_issue.id)       # another call to redmine
-
-        #json_str = json.dumps(single_issue._attributes, indent=4)
+        json_str = self.get_single_issue(issue_id)       # another call to redmine
 
-        fullpath = join(self.issue_dirname, self.pad_issue_id(single_issue.id) + '.json')
+        fullpath = join(self.issue_dirname, self.get_issue_fname(issue_id))
         open(fullpath, 'w').write(json_str)
         msg('Ticket retrieved: %s' % fullpath)
+        return json_str
 
 
 
@@ -241,11 +700,7 @@ print (data['total_count'])
         status_info = []
         priority_info = []
 
-        fnames = [x for x in os.listdir(issues_dirname) if x.endswith('.json')]
-        for fname in fnames:
-            content = open(join(issues_dirname, fname), 'rU').read()
-            d = json.loads(content)
-
+        for issue_num, d in get_issue_repository(issues_dirname).iter_issues():
 
             # Tracker Info
             tracker = d.get('tracker', None)
@@ -279,9 +734,9 @@ print (data['total_count'])
         :param ticket_id: int of issue id in redmine
         :returns: json string with issue information
         """
-        # test using .issue.get
-        issue = self.redmine_conn.issue.get(issue_id, include='children,journals,watchers,relations,attachments')
-        json_str = json.dumps(issue._attributes, indent=4)
+        data = self.get_redmine_api_json('issues/%s.json' % issue_id\
+                                        , dict(include='children,journals,watchers,relations,attachments'))
+        json_str = json.dumps(data['issue'], indent=4)
         msg('Issue retrieved: %s' % issue_id)
         return json_str
 
@@ -24,6 +24,9 @@ from jinja2 import Environment, PackageLoader
 from utils.msg_util import *
 from settings.base import GITHUB_TARGET_REPOSITORY, GITHUB_TARGET_USERNAME, get_gethub_issue_url
 from redmine_ticket.redmine_issue_downloader import RedmineIssueDownloader
+from redmine_ticket.issue_repository import get_issue_repository
+from redmine_ticket.issue_store import RedmineIssueStore
+from redmine_ticket.issue_pack import IssuePack
 
 class RedmineIssueUpdater:
     """
@@ -42,7 +45,7 @@ class RedmineIssueUpdater:
     #
     # If your issue numbers go beyond 99,999 then increase the ZERO_PADDING_LEVEL
     #    
-    def __init__(self, redmine_server, redmine_api_key, project_name_or_identifier, issues_dirname, redmine2github_id_map_filename):
+    def __init__(self, redmine_server, redmine_api_key, project_name_or_identifier, issues_dirname, redmine2github_id_map_filename, issue_store_fname=None, issue_pack_fname=None):
         """
         Constructor
         
@@ -50,11 +53,18 @@ class RedmineIssueUpdater:
         :param redmine_api_key: str with a redmine api key
         :param project_name_or_identifier: str or int with either the redmine project id or project identifier
         :param issues_base_directory: str, directory to download the redmine issues in JSON format.  Directory will be crated
+        :param issue_store_fname: optional str, SQLite file written by the RedmineIssueDownloader.  If given, issues are read from it
+        :param issue_pack_fname: optional str, pack file written by the RedmineIssueDownloader.  If given, issues are read from it
         """
         self.redmine_server = redmine_server
         self.redmine_api_key = redmine_api_key
         self.project_name_or_identifier = project_name_or_identifier
         self.issue_dirname = issues_dirname
+        self.issue_store = None
+        if issue_store_fname:
+            self.issue_store = RedmineIssueStore(issue_store_fname, zero_padding_level=RedmineIssueDownloader.ZERO_PADDING_LEVEL)
+        elif issue_pack_fname:
+            self.issue_store = IssuePack(issue_pack_fname, zero_padding_level=RedmineIssueDownloader.ZERO_PADDING_LEVEL)
         msg('redmine2github_id_map_filename: %s' % redmine2github_id_map_filename)
         self.redmine2github_id_map = json.loads(open(redmine2github_id_map_filename, 'rU').read())
         
@@ -67,7 +77,7 @@ class RedmineIssueUpdater:
         
     def setup(self):
         self.connect_to_redmine()
-        if not isdir(self.issue_dirname):
+        if self.issue_store is None and not isdir(self.issue_dirname):
             msgx('Directory doesn\'t exist: %s' % self.issue_dirname)
         
         
@@ -92,10 +102,9 @@ class RedmineIssueUpdater:
             msg('github_issue_id: %s' % github_issue_id)
     
             fname = redmine_issue_num.zfill(RedmineIssueDownloader.ZERO_PADDING_LEVEL) + '.json'
-            redmine_issue_fname = os.path.join(self.issue_dirname, fname)
-            if not os.path.isfile(redmine_issue_fname):
-                msgx('file not found: %s' % redmine_issue_fname)
-            redmine_issue_dict = json.loads(open(redmine_issue_fname, 'rU').read())
+            redmine_issue_dict = get_issue_repository(self.issue_dirname, issue_store=self.issue_store).get_issue_by_fname(fname)
+            if redmine_issue_dict is None:
+                msgx('file not found: %s' % os.path.join(self.issue_dirname, fname))
 
             github_issue_url = get_gethub_issue_url(github_issue_id)
             
@@ -46,6 +46,9 @@ LABEL_MAP_FILE = config.LABEL_MAP_FILE
 #   example, see settings/sample_milestone_map.csv
 MILESTONE_MAP_FILE = config.MILESTONE_MAP_FILE
 
+# (optional) Number of pooled http connections kept open per host (redmine, github)
+HTTP_POOL_SIZE = getattr(config, 'HTTP_POOL_SIZE', 10)
+
 
 def get_gethub_issue_url(issue_id=None):
     """
@@ -43,5 +43,8 @@ LABEL_MAP_FILE = join(WORKING_FILES_DIRECTORY, 'redmine2github_label_map.csv')
 #   example, see settings/sample_milestone_map.csv
 MILESTONE_MAP_FILE = join(WORKING_FILES_DIRECTORY, 'redmine2github_milestone_map.csv')
 
+# (optional) Number of pooled http connections kept open per host (redmine, github)
+HTTP_POOL_SIZE = 10
+
 def get_github_auth():
    return dict(login=GITHUB_LOGIN, password=GITHUB_PASSWORD_OR_PERSONAL_ACCESS_TOKEN, repo=GITHUB_TARGET_REPOSITORY, user=GITHUB_TARGET_USERNAME)
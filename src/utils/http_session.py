@@ -0,0 +1,65 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# Number of pooled connections kept open per host, if settings.base has no HTTP_POOL_SIZE.
+# Should be at least the number of threads making calls at the same time
+DEFAULT_HTTP_POOL_SIZE = 10
+
+_session = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+
+
+def get_pool_size_setting():
+    """
+    :returns: int, HTTP_POOL_SIZE from settings.base.  DEFAULT_HTTP_POOL_SIZE if there are no settings, e.g. in the scripts
+    """
+    try:
+        from settings.base import HTTP_POOL_SIZE
+    except ImportError:
+        return DEFAULT_HTTP_POOL_SIZE
+    return HTTP_POOL_SIZE
+
+
+def mount_pooled_adapter(session, pool_size):
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+def make_http_session(pool_size=DEFAULT_HTTP_POOL_SIZE):
+    """
+    Make a requests session with connection pooling and keep-alive.
+    Responses are gzip compressed when the server supports it.
+
+    :param pool_size: int, number of connections kept open per host
+    """
+    session = requests.Session()
+    mount_pooled_adapter(session, pool_size)
+    session.headers.update({ 'Accept-Encoding' : 'gzip, deflate'\
+                            , 'Connection' : 'keep-alive'\
+                            })
+    return session
+
+
+def get_http_session(min_pool_size=None):
+    """
+    Session shared by all the redmine and github calls, so connections
+    are re-used instead of doing a new TCP+TLS handshake for each call.
+
+    The pool size is the HTTP_POOL_SIZE setting (see get_pool_size_setting()), read when the session is made.
+
+    :param min_pool_size: optional int, e.g. the caller's number of threads.  If it's larger than
+                the current pool, the pool is made larger--whichever caller made the session first
+    """
+    global _session, _session_pool_size
+    if _session is None or (min_pool_size or 0) > _session_pool_size:
+        with _session_lock:
+            if _session is None:
+                _session_pool_size = max(get_pool_size_setting(), min_pool_size or 0)
+                _session = make_http_session(_session_pool_size)
+            elif (min_pool_size or 0) > _session_pool_size:
+                _session_pool_size = min_pool_size
+                mount_pooled_adapter(_session, _session_pool_size)
+    return _session
@@ -0,0 +1,145 @@
+from __future__ import print_function
+import time
+import threading
+
+from utils.msg_util import *
+
+
+class RateLimiter:
+    """
+    Pace calls to the GitHub API.
+
+    - A token bucket keeps calls under a per-minute rate (the "secondary" limit on content creation)
+    - The hourly budget is read from the X-RateLimit-Remaining/X-RateLimit-Reset headers.
+        While plenty of the budget remains, calls aren't slowed at all.  Once it falls below
+        "low_water_fraction", the remaining calls are spread evenly until the reset time.
+    - On a 403/429, wait for the Retry-After header, the reset time or--for a secondary
+        limit without a Retry-After--an increasing backoff
+
+    Thread safe, so one limiter may be shared by several threads.
+    """
+
+    SECONDARY_LIMIT_PHRASES = ['secondary rate limit', 'abuse detection']
+
+    def __init__(self, requests_per_minute=150, burst=20, low_water_fraction=0.1, reserve=10):
+        """
+        :param requests_per_minute: int, sustained rate allowed by the token bucket
+        :param burst: int, number of calls that may be made back to back
+        :param low_water_fraction: float, start pacing when this fraction of the hourly budget remains
+        :param reserve: int, calls kept back from the hourly budget
+        """
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.low_water_fraction = low_water_fraction
+        self.reserve = reserve
+
+        self.lock = threading.Lock()
+        self.last_refill = time.time()
+        self.next_call_time = 0         # budget pacing
+        self.blocked_until = 0          # after a limit response
+
+        self.limit = None               # X-RateLimit-Limit
+        self.remaining = None           # X-RateLimit-Remaining
+        self.reset_epoch = None         # X-RateLimit-Reset
+
+        self.backoff_seconds = 60
+        self.total_sleep_seconds = 0.0
+        self.limited_response_count = 0
+
+    def get_wait_seconds(self, now):
+        """
+        :returns: seconds to wait before the next call.  0 if a call may be made now
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        # hourly budget used up (apart from the reserve)
+        if self.remaining is not None and self.reset_epoch is not None:
+            if self.remaining <= self.reserve and now < self.reset_epoch:
+                return self.reset_epoch - now + 1
+
+        if now < self.next_call_time:
+            return self.next_call_time - now
+
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+
+        return 0
+
+    def get_pacing_interval(self, now):
+        """
+        :returns: seconds between calls so that the remaining hourly budget lasts until the reset
+        """
+        if self.remaining is None or self.reset_epoch is None or not self.limit:
+            return 0
+        if self.remaining > self.limit * self.low_water_fraction:
+            return 0
+        usable = max(self.remaining - self.reserve, 1)
+        return max(self.reset_epoch - now, 0) / float(usable)
+
+    def acquire(self):
+        """
+        Block until a call may be made, then take a token
+        """
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+
+                wait_seconds = self.get_wait_seconds(now)
+                if wait_seconds <= 0:
+                    self.tokens -= 1
+                    self.next_call_time = now + self.get_pacing_interval(now)
+                    if self.remaining is not None:
+                        self.remaining -= 1     # updated again from the response
+                    return
+                self.total_sleep_seconds += wait_seconds
+
+            if wait_seconds > 5:
+                msg('Rate limit: sleeping %.1f seconds' % wait_seconds)
+            time.sleep(wait_seconds)
+
+    def update_from_response(self, r):
+        """
+        Read the rate limit headers of a response
+
+        :param r: requests response
+        :returns: True if the call was rejected by a rate limit (and may be retried), False otherwise
+        """
+        headers = r.headers
+        now = time.time()
+        with self.lock:
+            if headers.get('X-RateLimit-Limit'):
+                self.limit = int(headers['X-RateLimit-Limit'])
+            if headers.get('X-RateLimit-Remaining'):
+                self.remaining = int(headers['X-RateLimit-Remaining'])
+            if headers.get('X-RateLimit-Reset'):
+                self.reset_epoch = int(headers['X-RateLimit-Reset'])
+
+            if not r.status_code in (403, 429):
+                self.backoff_seconds = 60
+                return False
+
+            retry_after = headers.get('Retry-After')
+            body = r.text.lower()
+            if retry_after:
+                self.blocked_until = now + int(retry_after)
+            elif self.remaining == 0 and self.reset_epoch:
+                self.blocked_until = self.reset_epoch + 1
+            elif [x for x in self.SECONDARY_LIMIT_PHRASES if x in body]:
+                self.blocked_until = now + self.backoff_seconds
+                self.backoff_seconds = min(self.backoff_seconds * 2, 15 * 60)
+            elif 'rate limit' in body:
+                self.blocked_until = now + self.backoff_seconds
+            else:
+                return False    # a 403 for some other reason
+
+            self.limited_response_count += 1
+            msgt('Rate limited (status %s).  Waiting %.1f seconds' % (r.status_code, self.blocked_until - now))
+            return True
+
+    def show_stats(self):
+        msg('Rate limit: %.1f seconds spent waiting, %s limited responses, remaining budget: %s' % \
+                (self.total_sleep_seconds, self.limited_response_count, self.remaining))
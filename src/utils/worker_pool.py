@@ -0,0 +1,86 @@
+from __future__ import print_function
+import threading
+import traceback
+try:
+    import Queue as queue
+except:
+    import queue        # python 3.x
+
+
+class WorkerPool:
+    """
+    A small, fixed-size pool of threads that run submitted functions.
+
+    - The task queue is bounded, so a fast producer (e.g. a paging loop) blocks
+        instead of building up an unbounded backlog
+    - An exception in one task is captured in "self.errors"; the other tasks keep running
+    """
+
+    _STOP = object()
+
+    def __init__(self, num_workers=4, max_queue_size=None, name='worker'):
+        """
+        :param num_workers: int, number of threads
+        :param max_queue_size: int, max number of waiting tasks.  Default is 4 x num_workers
+        :param name: str, prefix for the thread names
+        """
+        if num_workers < 1:
+            num_workers = 1
+        if max_queue_size is None:
+            max_queue_size = num_workers * 4
+
+        self.num_workers = num_workers
+        self.name = name
+        self.task_queue = queue.Queue(max_queue_size)
+        self.threads = []
+
+        self.lock = threading.Lock()
+        self.errors = []            # [ (task label, error message, traceback str), ...]
+        self.completed_count = 0
+
+    def start(self):
+        for idx in range(0, self.num_workers):
+            t = threading.Thread(target=self.run_worker, name='%s-%s' % (self.name, idx+1))
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+        return self
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue a function call.  Blocks if the queue is full.
+
+        :param label: optional kwarg, used to identify the task in self.errors.  Defaults to the args
+        """
+        label = kwargs.pop('label', args)
+        self.task_queue.put((func, args, kwargs, label))
+
+    def run_worker(self):
+        while True:
+            task = self.task_queue.get()
+            try:
+                if task is self._STOP:
+                    return
+                func, args, kwargs, label = task
+                try:
+                    func(*args, **kwargs)
+                    with self.lock:
+                        self.completed_count += 1
+                except (Exception, SystemExit) as e:
+                    # SystemExit: the msgx() calls shouldn't stop the whole batch
+                    with self.lock:
+                        self.errors.append((label, '%s' % e, traceback.format_exc()))
+            finally:
+                self.task_queue.task_done()
+
+    def join(self):
+        """Wait for all queued tasks to finish, then stop the threads"""
+        for t in self.threads:
+            self.task_queue.put(self._STOP)
+        for t in self.threads:
+            t.join()
+        self.threads = []
+
+    def get_error_count(self):
+        with self.lock:
+            return len(self.errors)